@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import glob
+import json
+import os
+import sys
+import time
+from extract_frames import (extract_frames, time_to_frame, DECODE_MODES, DECODE_AUTO, DECODERS, DECODER_OPENCV,
+                            DEFAULT_CROP_BOX, DEFAULT_OUTPUT_SIZE)
+from lazy import lazy_import
+from transform import FrameTransform
+
+cv2 = lazy_import('cv2')
+
+VIDEO_EXTENSIONS = ('mp4', 'avi', 'mov', 'mkv')
+SUMMARY_NAME = 'batch_summary.json'
+
+class ExtractionJob:
+    """
+    One video of a batch with its extraction settings and outcome
+    """
+
+    def __init__(self, video_path, output_folder, frame_interval=60, start_time='0:00', end_time=None,
+                 crop_box=DEFAULT_CROP_BOX, output_size=DEFAULT_OUTPUT_SIZE):
+        """
+        Args:
+            video_path (str): Path to the video file
+            output_folder (str): Folder to save the extracted frames
+            frame_interval (int): Number of frames between extractions (default: 60)
+            start_time (str or float): Start time in mm:ss format or in seconds (default: 0:00)
+            end_time (str or float): End time in mm:ss format or in seconds (default: None, until the end)
+            crop_box (tuple): Crop rectangle as a (left, upper, right, lower)-tuple
+            output_size (tuple): Output size as (width, height)
+        """
+        self.video_path = video_path
+        self.output_folder = output_folder
+        self.frame_interval = frame_interval
+        self.start_time = start_time
+        self.end_time = end_time
+        self.crop_box = tuple(crop_box) if crop_box is not None else None
+        self.output_size = tuple(output_size) if output_size is not None else None
+        self.frames = 0
+        self.attempts = 0
+        self.status = 'pending'
+        self.error = None
+        self.frames_saved = 0
+        self.bytes_written = 0
+        self.elapsed = 0.0
+
+    @property
+    def log_path(self):
+        """Return the file the job's console output goes to, next to its output folder"""
+        return os.path.normpath(self.output_folder) + '.log'
+
+    def count_frames(self):
+        """Set frames to the number of frames in the selected range, 0 if the video cannot be read"""
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if not cap.isOpened():
+                return 0
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            cap.release()
+        if fps <= 0:
+            return 0
+        start_frame = time_to_frame(self.start_time, fps, 0)
+        end_frame = time_to_frame(self.end_time, fps, total_frames)
+        self.frames = max(0, min(end_frame, total_frames) - start_frame)
+        return self.frames
+
+    def summary(self):
+        return {'video_path': self.video_path, 'output_folder': self.output_folder, 'status': self.status,
+                'frames': self.frames, 'frames_saved': self.frames_saved, 'bytes_written': self.bytes_written,
+                'elapsed': round(self.elapsed, 3), 'attempts': self.attempts, 'error': self.error}
+
+def _job_folder(output_root, video_path, used_names):
+    """Return an output folder named after the video, unique within the batch"""
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    unique_name = name
+    suffix = 2
+    while unique_name in used_names:
+        unique_name = f"{name}_{suffix}"
+        suffix += 1
+    used_names.add(unique_name)
+    return os.path.join(output_root, unique_name)
+
+def load_job_manifest(manifest_path, output_root, defaults):
+    """
+    Read jobs from a JSON manifest
+
+    The manifest is a list of objects with a 'video' path (relative to the
+    manifest) and optional 'output', 'start', 'end', 'interval', 'crop' and
+    'size' overriding the batch defaults.
+
+    Args:
+        manifest_path (str): Path to the manifest
+        output_root (str): Folder holding one output folder per video
+        defaults (dict): ExtractionJob keyword arguments used when a job does not set them
+
+    Returns:
+        list: ExtractionJobs in manifest order
+    """
+    with open(manifest_path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError("Error: Job manifest must be a list of jobs")
+
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    keys = {'start': 'start_time', 'end': 'end_time', 'interval': 'frame_interval', 'crop': 'crop_box',
+            'size': 'output_size'}
+    jobs = []
+    used_names = set()
+    for entry in entries:
+        if 'video' not in entry:
+            raise ValueError(f"Error: Job manifest entry without a video: {entry}")
+        video_path = os.path.join(base, entry['video'])
+        if 'output' in entry:
+            output_folder = os.path.join(output_root, entry['output'])
+            used_names.add(entry['output'])
+        else:
+            output_folder = _job_folder(output_root, video_path, used_names)
+
+        settings = dict(defaults)
+        settings.update({keys[key]: value for key, value in entry.items() if key in keys})
+        jobs.append(ExtractionJob(video_path, output_folder, **settings))
+    return jobs
+
+def collect_jobs(source, output_root, defaults):
+    """
+    Build the jobs of a batch from a directory, a glob pattern or a JSON job manifest
+
+    Args:
+        source (str): Directory of videos, glob pattern or path to a .json job manifest
+        output_root (str): Folder holding one output folder per video
+        defaults (dict): ExtractionJob keyword arguments shared by every job
+
+    Returns:
+        list: ExtractionJobs
+    """
+    if os.path.isfile(source) and source.lower().endswith('.json'):
+        return load_job_manifest(source, output_root, defaults)
+
+    if os.path.isdir(source):
+        video_paths = sorted(
+            entry.path for entry in os.scandir(source)
+            if entry.name.lower().endswith(VIDEO_EXTENSIONS) and entry.is_file()
+        )
+    else:
+        video_paths = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    if not video_paths:
+        raise ValueError(f"Error: No videos found in {source}")
+
+    used_names = set()
+    return [ExtractionJob(path, _job_folder(output_root, path, used_names), **defaults) for path in video_paths]
+
+def run_job(job, options):
+    """
+    Process pool entry point: extract one job, writing its console output to its log file
+
+    Returns:
+        tuple: (frames saved, bytes written, seconds taken)
+    """
+    os.makedirs(os.path.dirname(job.log_path) or '.', exist_ok=True)
+    with open(job.log_path, 'w') as log, contextlib.redirect_stdout(log):
+        stats = extract_frames(job.video_path, job.output_folder, job.frame_interval, job.start_time, job.end_time,
+                               transform=FrameTransform(job.crop_box, job.output_size), **options)
+    return stats.frames_kept, stats.bytes_written, stats.elapsed
+
+def run_batch(jobs, output_root, concurrency=None, retries=1, options=None):
+    """
+    Extract every job across one process pool, longest first, and write a summary
+
+    Jobs are ordered by the number of frames they cover, so the longest videos
+    start first and short ones fill the gaps at the end. A failed job is
+    resubmitted up to retries times.
+
+    Args:
+        jobs (list): ExtractionJobs
+        output_root (str): Folder receiving the summary file
+        concurrency (int): Maximum jobs running at once (default: number of CPUs)
+        retries (int): Extra attempts for a failed job (default: 1)
+        options (dict): Extra extract_frames keyword arguments shared by every job
+
+    Returns:
+        dict: The summary written to SUMMARY_NAME in output_root
+    """
+    options = options or {}
+    concurrency = concurrency or os.cpu_count() or 1
+    if concurrency < 1 or retries < 0:
+        raise ValueError("Error: Concurrency must be at least 1 and retries at least 0")
+
+    for job in jobs:
+        job.count_frames()
+    jobs = sorted(jobs, key=lambda job: job.frames, reverse=True)
+
+    print(f"Batch: {len(jobs)} videos, {sum(job.frames for job in jobs)} frames, {concurrency} concurrent jobs")
+    start = time.perf_counter()
+    finished = 0
+    with ProcessPoolExecutor(max_workers=min(concurrency, len(jobs)) or 1) as executor:
+        pending = {executor.submit(run_job, job, options): job for job in jobs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                job.attempts += 1
+                try:
+                    job.frames_saved, job.bytes_written, job.elapsed = future.result()
+                except Exception as e:
+                    job.error = f"{type(e).__name__}: {e}"
+                    if job.attempts <= retries:
+                        print(f"Retrying {job.video_path} after {job.error}")
+                        pending[executor.submit(run_job, job, options)] = job
+                        continue
+                    job.status = 'failed'
+                else:
+                    job.status = 'done'
+                    job.error = None
+
+                finished += 1
+                outcome = f"{job.frames_saved} frames" if job.status == 'done' else job.error
+                print(f"[{finished}/{len(jobs)}] {job.status}: {job.video_path} ({outcome})")
+
+    elapsed = time.perf_counter() - start
+    frames_saved = sum(job.frames_saved for job in jobs)
+    bytes_written = sum(job.bytes_written for job in jobs)
+    summary = {
+        'jobs': [job.summary() for job in jobs],
+        'done': sum(job.status == 'done' for job in jobs),
+        'failed': sum(job.status == 'failed' for job in jobs),
+        'frames_saved': frames_saved,
+        'bytes_written': bytes_written,
+        'elapsed': round(elapsed, 3),
+        'fps': round(frames_saved / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+    os.makedirs(output_root, exist_ok=True)
+    summary_path = os.path.join(output_root, SUMMARY_NAME)
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\nBatch complete: {summary['done']} done, {summary['failed']} failed")
+    print(f"Throughput: {summary['fps']:.1f} frames/sec, {bytes_written / (1024 * 1024):.1f} MB written "
+          f"in {elapsed:.1f} seconds")
+    print(f"Summary written to {summary_path}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Extract frames from many videos with one shared process pool',
+        epilog='Example: python batch.py recordings/ frames/ --interval 30 --jobs 4'
+    )
+    parser.add_argument('source', type=str,
+                        help='Directory of videos, quoted glob pattern (e.g. "rec/**/*.mp4") or .json job manifest')
+    parser.add_argument('output_root', type=str, help='Folder receiving one output folder per video')
+    parser.add_argument('--interval', type=int, default=60,
+                        help='Default number of frames between extractions (default: 60)')
+    parser.add_argument('--start', type=str, default='0:00',
+                        help='Default start time in mm:ss format (default: 0:00)')
+    parser.add_argument('--end', type=str, default=None,
+                        help='Default end time in mm:ss format (default: end of video)')
+    parser.add_argument('--crop', type=int, nargs=4, default=DEFAULT_CROP_BOX,
+                        metavar=('LEFT', 'UPPER', 'RIGHT', 'LOWER'),
+                        help=f'Default crop box in source pixels (default: {" ".join(map(str, DEFAULT_CROP_BOX))})')
+    parser.add_argument('--size', type=int, nargs=2, default=DEFAULT_OUTPUT_SIZE, metavar=('WIDTH', 'HEIGHT'),
+                        help=f'Default output size (default: {" ".join(map(str, DEFAULT_OUTPUT_SIZE))})')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Maximum videos extracted at once (default: number of CPUs)')
+    parser.add_argument('--retries', type=int, default=1,
+                        help='Extra attempts for a failed video (default: 1)')
+    parser.add_argument('--decode-mode', choices=DECODE_MODES, default=DECODE_AUTO,
+                        help='How skipped frames are decoded (default: auto)')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='Encode threads per video, 0 to encode inline (default: 0)')
+    parser.add_argument('--decoder', choices=DECODERS, default=DECODER_OPENCV,
+                        help='Library decoding the videos, ffmpeg falling back to opencv (default: opencv)')
+
+    args = parser.parse_args()
+
+    defaults = {'frame_interval': args.interval, 'start_time': args.start, 'end_time': args.end,
+                'crop_box': args.crop, 'output_size': args.size}
+    jobs = collect_jobs(args.source, args.output_root, defaults)
+    summary = run_batch(jobs, args.output_root, args.jobs, args.retries,
+                        {'decode_mode': args.decode_mode, 'threads': args.threads,
+                         'decoder': args.decoder})
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import cv2
+import numpy as np
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from PIL import Image
+from crop import crop_images_in_folder
+from extract_frames import (DECODE_AUTO, DECODE_READ, DECODE_GRAB, DECODE_SEEK, DEFAULT_CROP_BOX, DEFAULT_OUTPUT_SIZE,
+                            extract_frames, iter_kept_frames)
+from sinks import ImageSink
+from transform import FrameTransform
+from video_index import scan_packets
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# Container each benchmarked codec is written to
+CODEC_CONTAINERS = {'mp4v': 'mp4', 'MJPG': 'avi', 'XVID': 'avi'}
+PERCENTILES = (50, 90, 99)
+
+def make_synthetic_video(video_path, num_frames, size=(1920, 1080), fps=30, codec='mp4v', gop=None):
+    """
+    Write a synthetic test clip with moving content to video_path
+
+    Args:
+        video_path (str): Path of the video file to create
+        num_frames (int): Number of frames to write
+        size (tuple): Frame size as (width, height)
+        fps (float): Frame rate of the clip
+        codec (str): FourCC of the codec (default: mp4v)
+        gop (int): Frames between keyframes, None for the codec default. Not every OpenCV
+            build honours it; see measured_gop
+    """
+    width, height = size
+    params = []
+    if gop is not None:
+        if not hasattr(cv2, 'VIDEOWRITER_PROP_KEY_INTERVAL'):
+            raise ValueError("Error: This OpenCV version cannot set the keyframe interval")
+        params = [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop]
+    writer = cv2.VideoWriter(video_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*codec), fps, size, params)
+    if not writer.isOpened():
+        raise ValueError(f"Error: Could not create synthetic {codec} video")
+
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for i in range(num_frames):
+        frame = np.roll(background, i * 8, axis=1)
+        cv2.putText(frame, f"{i:06d}", (width // 3, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 4, (255, 255, 255), 8)
+        writer.write(frame)
+    writer.release()
+
+def benchmark_decode(video_path, frame_interval, decode_mode):
+    """
+    Time a full pass of iter_kept_frames over a video with one decode mode
+
+    Args:
+        video_path (str): Path to the video file
+        frame_interval (int): Number of frames between extractions
+        decode_mode (str): Decode mode to benchmark
+
+    Returns:
+        dict: Kept frame count, elapsed seconds and source frames/sec
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Error: Could not open video file")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    start = time.perf_counter()
+    kept = sum(1 for _ in iter_kept_frames(cap, 0, total_frames, frame_interval, decode_mode))
+    elapsed = time.perf_counter() - start
+    cap.release()
+
+    return {'kept': kept, 'elapsed': elapsed, 'fps': total_frames / elapsed}
+
+def make_synthetic_images(folder, num_images, size=(1920, 1080)):
+    """
+    Write num_images synthetic JPEGs to folder
+
+    Args:
+        folder (str): Folder to write the images in
+        num_images (int): Number of images to write
+        size (tuple): Image size as (width, height)
+    """
+    width, height = size
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for i in range(num_images):
+        cv2.imwrite(os.path.join(folder, f"image_{i:06d}.jpg"), np.roll(background, i * 8, axis=1))
+
+def measured_gop(video_path):
+    """Return the median distance between the keyframes of a video, None if it has fewer than two"""
+    keyframes, _ = scan_packets(video_path)
+    if len(keyframes) < 2:
+        return None
+    return int(np.median(np.diff(keyframes)))
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB, None where it cannot be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def latency_stats(samples):
+    """
+    Summarize per-item latencies
+
+    Args:
+        samples (list): Latencies in seconds
+
+    Returns:
+        dict: Item count, total seconds, and mean and percentile latencies in ms
+    """
+    stats = {'count': len(samples), 'total_s': round(float(np.sum(samples)), 4)}
+    if samples:
+        ms = np.asarray(samples) * 1000
+        stats['mean_ms'] = round(float(ms.mean()), 4)
+        for percentile, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+            stats[f"p{percentile}_ms"] = round(float(value), 4)
+    return stats
+
+def benchmark_extract_stages(video_path, frame_interval, transform, decode_mode=DECODE_AUTO):
+    """
+    Time the decode, crop/resize, encode and write stages of extraction separately, one frame at a time
+
+    Args:
+        video_path (str): Path to the video file
+        frame_interval (int): Number of frames between extractions
+        transform (FrameTransform): Crop and resize to apply
+        decode_mode (str): Decode mode, one of DECODE_MODES (default: auto)
+
+    Returns:
+        dict: Per-stage latency stats and the end-to-end frames/sec of the staged loop
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Error: Could not open video file")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    stages = {'decode': [], 'transform': [], 'encode': [], 'write': []}
+    # Synchronous writes, so the write stage measures the disk rather than a queue
+    sink = ImageSink(write_threads=0)
+    with tempfile.TemporaryDirectory() as output_folder:
+        sink.open(output_folder)
+        start = time.perf_counter()
+        frames = iter_kept_frames(cap, 0, total_frames, frame_interval, decode_mode)
+        while True:
+            t0 = time.perf_counter()
+            item = next(frames, None)
+            t1 = time.perf_counter()
+            if item is None:
+                break
+            frame_count, frame = item
+            image = transform.apply(frame)
+            t2 = time.perf_counter()
+            data = sink.encode(image)
+            t3 = time.perf_counter()
+            sink.write(frame_count, data)
+            t4 = time.perf_counter()
+            for stage, elapsed in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                stages[stage].append(elapsed)
+        elapsed = time.perf_counter() - start
+        sink.close()
+    cap.release()
+
+    kept = len(stages['decode'])
+    return {'kept': kept, 'fps': round(kept / elapsed, 2) if elapsed > 0 else 0.0,
+            'stages': {stage: latency_stats(samples) for stage, samples in stages.items()}}
+
+def benchmark_extract(video_path, frame_interval, transform):
+    """Time extract_frames end to end, then its stages; returns the results with the peak RSS"""
+    with tempfile.TemporaryDirectory() as output_folder, contextlib.redirect_stdout(io.StringIO()):
+        stats = extract_frames(video_path, output_folder, frame_interval, transform=transform)
+    result = {'end_to_end_fps': round(stats.fps, 2), 'frames_saved': stats.frames_kept,
+              'bytes_written': stats.bytes_written}
+    result.update(benchmark_extract_stages(video_path, frame_interval, transform))
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def benchmark_crop_stages(folder, transform):
+    """
+    Time the decode, crop/resize, encode and write stages of crop.crop_image on every image of a folder
+
+    Args:
+        folder (str): Folder of images
+        transform (FrameTransform): Crop and resize to apply
+
+    Returns:
+        dict: Per-stage latency stats and the images/sec of the staged loop
+    """
+    stages = {'decode': [], 'transform': [], 'encode': [], 'write': []}
+    with tempfile.TemporaryDirectory() as output_folder:
+        start = time.perf_counter()
+        for name in sorted(os.listdir(folder)):
+            t0 = time.perf_counter()
+            with Image.open(os.path.join(folder, name)) as img:
+                pixels = np.asarray(img)
+            t1 = time.perf_counter()
+            cropped = transform.apply(pixels)
+            t2 = time.perf_counter()
+            buffer = io.BytesIO()
+            Image.fromarray(cropped).save(buffer, format='JPEG')
+            t3 = time.perf_counter()
+            with open(os.path.join(output_folder, name), 'wb') as f:
+                f.write(buffer.getbuffer())
+            t4 = time.perf_counter()
+            for stage, elapsed in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                stages[stage].append(elapsed)
+        elapsed = time.perf_counter() - start
+
+    count = len(stages['decode'])
+    return {'images': count, 'fps': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            'stages': {stage: latency_stats(samples) for stage, samples in stages.items()}}
+
+def benchmark_crop(folder, transform):
+    """Time crop_images_in_folder end to end in one worker, then its stages; returns the results with the peak RSS"""
+    with tempfile.TemporaryDirectory() as output_folder, contextlib.redirect_stdout(io.StringIO()):
+        summary = crop_images_in_folder(folder, output_folder, transform.crop_box, transform.output_size, workers=1)
+    result = {'end_to_end_fps': round(summary['files_per_sec'], 2)}
+    result.update(benchmark_crop_stages(folder, transform))
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def run_isolated(function, *args):
+    """Run function(*args) in a fresh process, so its peak RSS is not inflated by earlier cases"""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, *args).result()
+
+def scaled_crop_box(size):
+    """Return the default crop box scaled from 1920x1080 to a frame of the given (width, height)"""
+    width, height = size
+    left, upper, right, lower = DEFAULT_CROP_BOX
+    return (left * width // 1920, upper * height // 1080, right * width // 1920, lower * height // 1080)
+
+def run_suite(resolutions, codecs, gops, num_frames, frame_interval, num_images):
+    """
+    Benchmark extraction over every resolution/codec/GOP and cropping over every resolution
+
+    Args:
+        resolutions (list): (width, height) tuples
+        codecs (list): FourCCs from CODEC_CONTAINERS
+        gops (list): Requested keyframe intervals; intra-only codecs (MJPG) are run once
+        num_frames (int): Length of each synthetic clip
+        frame_interval (int): Number of frames between extractions
+        num_images (int): Number of images in each synthetic crop folder
+
+    Returns:
+        dict: Environment, configuration and one result per case, ready to be written as JSON
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in resolutions:
+            transform = FrameTransform(scaled_crop_box(size), DEFAULT_OUTPUT_SIZE)
+            resolution = f"{size[0]}x{size[1]}"
+
+            for codec in codecs:
+                for gop in (gops if codec != 'MJPG' else [None]):
+                    video_path = os.path.join(tmp_dir, f"{resolution}_{codec}_{gop}.{CODEC_CONTAINERS[codec]}")
+                    print(f"extract {resolution} {codec} gop={gop}...")
+                    make_synthetic_video(video_path, num_frames, size, codec=codec, gop=gop)
+                    result = run_isolated(benchmark_extract, video_path, frame_interval, transform)
+                    result.update({'case': 'extract', 'resolution': resolution, 'codec': codec, 'gop': gop,
+                                   'measured_gop': measured_gop(video_path), 'frame_interval': frame_interval})
+                    results.append(result)
+                    os.remove(video_path)
+
+            if num_images:
+                folder = os.path.join(tmp_dir, f"images_{resolution}")
+                os.mkdir(folder)
+                print(f"crop {resolution}...")
+                make_synthetic_images(folder, num_images, size)
+                result = run_isolated(benchmark_crop, folder, transform)
+                result.update({'case': 'crop', 'resolution': resolution})
+                results.append(result)
+
+    return {
+        'environment': {'python': platform.python_version(), 'opencv': cv2.__version__, 'numpy': np.__version__,
+                        'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'config': {'frames': num_frames, 'frame_interval': frame_interval, 'images': num_images,
+                   'output_size': list(DEFAULT_OUTPUT_SIZE)},
+        'results': results,
+    }
+
+def parse_resolution(value):
+    """argparse type for WIDTHxHEIGHT"""
+    try:
+        width, height = map(int, value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Resolution must be WIDTHxHEIGHT, got {value}")
+    return width, height
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the frame decode strategies on a synthetic clip')
+    parser.add_argument('--frames', type=int, default=600, help='Length of the synthetic clip (default: 600)')
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 60, 300],
+                        help='Frame intervals to benchmark (default: 1 60 300)')
+    parser.add_argument('--video', type=str, default=None,
+                        help='Benchmark an existing video instead of a synthetic clip')
+    parser.add_argument('--suite', action='store_true',
+                        help='Run the per-stage extraction and crop suite instead of the decode mode comparison')
+    parser.add_argument('--resolutions', type=parse_resolution, nargs='+',
+                        default=[(640, 360), (1280, 720), (1920, 1080)],
+                        help='Suite: video and image resolutions (default: 640x360 1280x720 1920x1080)')
+    parser.add_argument('--codecs', choices=CODEC_CONTAINERS, nargs='+', default=['mp4v', 'MJPG'],
+                        help='Suite: video codecs (default: mp4v MJPG)')
+    parser.add_argument('--gops', type=int, nargs='+', default=[12, 250],
+                        help='Suite: keyframe intervals (default: 12 250)')
+    parser.add_argument('--interval', type=int, default=5,
+                        help='Suite: frame interval of the extraction (default: 5)')
+    parser.add_argument('--images', type=int, default=100,
+                        help='Suite: images per crop folder, 0 to skip cropping (default: 100)')
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help='Suite: JSON file receiving the results (default: benchmark_results.json)')
+    args = parser.parse_args()
+
+    if args.suite:
+        results = run_suite(args.resolutions, args.codecs, args.gops, args.frames, args.interval, args.images)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+        print(f"\n{'case':>7} {'resolution':>10} {'codec':>5} {'gop':>4} {'fps':>8} {'e2e fps':>8} "
+              f"{'decode p50':>10} {'xform p50':>9} {'encode p50':>10} {'write p50':>9} {'rss MB':>7}")
+        for result in results['results']:
+            stages = result['stages']
+            p50 = [stages[stage].get('p50_ms', 0.0) for stage in ('decode', 'transform', 'encode', 'write')]
+            rss = result['peak_rss_mb']
+            print(f"{result['case']:>7} {result['resolution']:>10} {result.get('codec', '-'):>5} "
+                  f"{str(result.get('gop', '-')):>4} {result['fps']:>8.1f} {result['end_to_end_fps']:>8.1f} "
+                  f"{p50[0]:>10.2f} {p50[1]:>9.2f} {p50[2]:>10.2f} {p50[3]:>9.2f} "
+                  f"{str(round(rss)) if rss is not None else '-':>7}")
+        print(f"\nResults written to {args.output}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(tmp_dir, 'synthetic.mp4')
+            print(f"Generating synthetic clip ({args.frames} frames)...")
+            make_synthetic_video(video_path, args.frames)
+
+        print(f"\n{'interval':>8} {'mode':>6} {'kept':>6} {'seconds':>8} {'frames/sec':>11}")
+        for frame_interval in args.intervals:
+            for decode_mode in (DECODE_READ, DECODE_GRAB, DECODE_SEEK):
+                result = benchmark_decode(video_path, frame_interval, decode_mode)
+                print(f"{frame_interval:>8} {decode_mode:>6} {result['kept']:>6} "
+                      f"{result['elapsed']:>8.2f} {result['fps']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+# Both load OpenCV, NumPy and Pillow lazily, so building the parser stays cheap
+# and `--help` and argument errors return without loading them
+import crop
+import extract_frames
+
+def run_gui(parser, args):
+    if args.video_path and not os.path.isfile(args.video_path):
+        parser.error(f"video file not found: {args.video_path}")
+    # Tk, Pillow and OpenCV are loaded eagerly by the application, so only import it here
+    import video_player
+    video_player.main(args.video_path)
+
+def build_parser():
+    """Return the parser of the unified command line and its subparsers by command"""
+    parser = argparse.ArgumentParser(
+        description='Video frame extractor',
+        epilog='Run "python cli.py <command> --help" for the options of a command'
+    )
+    subparsers = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    extract_parser = subparsers.add_parser(
+        'extract', help='Extract frames from a video file',
+        epilog='Example: python cli.py extract video.mp4 output_frames --interval 5 --start 1:30 --end 2:45'
+    )
+    extract_frames.add_arguments(extract_parser)
+    extract_parser.set_defaults(handler=extract_frames.run)
+
+    crop_parser = subparsers.add_parser(
+        'crop', help='Crop (and optionally resize) every image in a folder',
+        epilog='Example: python cli.py crop frames frames_cropped --crop 582 143 1600 670'
+    )
+    crop.add_arguments(crop_parser)
+    crop_parser.set_defaults(handler=crop.run)
+
+    gui_parser = subparsers.add_parser('gui', help='Open the video player application')
+    gui_parser.add_argument('video_path', type=str, nargs='?', default=None, help='Video to open at startup')
+    gui_parser.set_defaults(handler=run_gui)
+
+    return parser, subparsers.choices
+
+def main(argv=None):
+    parser, subparsers = build_parser()
+    args = parser.parse_args(argv)
+    args.handler(subparsers[args.command], args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,47 +1,272 @@
+import argparse
 import os
-from PIL import Image
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from lazy import lazy_import
+from sinks import is_frame_subdir
+from transform import FrameTransform, INTERPOLATIONS
 
-def crop_images_in_folder(folder_path, output_folder, crop_box):
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'tiff', 'gif')
+
+# Files handed to a worker process at a time
+CHUNK_SIZE = 64
+
+def iter_image_files(folder_path):
+    """
+    Stream the image files of a folder without listing it up front
+
+    The frame subdirectories written by extract_frames.py --subdir-size
+    (frames_NNNNNN) are streamed too; other subdirectories are ignored.
+
+    Args:
+        folder_path (str): Path to the folder containing images.
+
+    Yields:
+        tuple: (os.DirEntry, path relative to folder_path) of each image file.
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                yield entry, entry.name
+            elif is_frame_subdir(entry.name) and entry.is_dir():
+                with os.scandir(entry.path) as sub_entries:
+                    for sub_entry in sub_entries:
+                        if sub_entry.name.lower().endswith(IMAGE_EXTENSIONS) and sub_entry.is_file():
+                            yield sub_entry, os.path.join(entry.name, sub_entry.name)
+
+def iter_chunks(items, chunk_size):
+    """Group an iterable into lists of at most chunk_size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def is_up_to_date(input_mtime, output_path):
+    """Return True if output_path exists and is not older than its input"""
+    try:
+        return os.stat(output_path).st_mtime >= input_mtime
+    except FileNotFoundError:
+        return False
+
+def jpeg_mcu_size(img):
+    """
+    Return the (width, height) of a JPEG's minimum coded unit
+
+    Args:
+        img (PIL.Image.Image): Opened JPEG image.
+
+    Returns:
+        tuple: MCU size in pixels, derived from the largest chroma sampling factors.
+    """
+    h_sampling = max(layer[1] for layer in img.layer)
+    v_sampling = max(layer[2] for layer in img.layer)
+    return 8 * h_sampling, 8 * v_sampling
+
+def crop_jpeg_lossless(file_path, output_path, crop_box):
+    """
+    Crop a JPEG without decoding it, using jpegtran
+
+    Only exact when the left and upper edges of the box are MCU-aligned.
+
+    Args:
+        file_path (str): Path of the input JPEG.
+        output_path (str): Path to save the cropped JPEG.
+        crop_box (tuple): The crop rectangle, as a (left, upper, right, lower)-tuple.
+    """
+    left, upper, right, lower = crop_box
+    subprocess.run(
+        ['jpegtran', '-perfect', '-copy', 'all', '-crop', f"{right - left}x{lower - upper}+{left}+{upper}",
+         '-outfile', output_path, file_path],
+        check=True, capture_output=True
+    )
+
+def crop_image(file_path, output_path, transform):
+    """
+    Crop (and resize) a single image
+
+    JPEGs are cropped losslessly with jpegtran when it is installed, no resize is
+    requested and the crop box is MCU-aligned; everything else is decoded,
+    transformed and re-encoded.
+
+    Args:
+        file_path (str): Path of the input image.
+        output_path (str): Path to save the cropped image.
+        transform (FrameTransform): Crop and resize to apply.
+
+    Returns:
+        bool: True if the image was cropped losslessly.
+    """
+    with Image.open(file_path) as img:
+        if (transform.output_size is None and img.format == 'JPEG' and shutil.which('jpegtran')
+                and transform.crop_box is not None):
+            left, upper, right, lower = transform.crop_box
+            mcu_width, mcu_height = jpeg_mcu_size(img)
+            transform.crop_size((img.height, img.width))
+            if left % mcu_width == 0 and upper % mcu_height == 0:
+                try:
+                    crop_jpeg_lossless(file_path, output_path, transform.crop_box)
+                    return True
+                except subprocess.CalledProcessError:
+                    pass
+
+        # Paletted images can only be cropped, not interpolated
+        if img.mode == 'P' and transform.output_size is not None:
+            img = img.convert('RGBA')
+
+        # Crop the image
+        cropped_img = Image.fromarray(transform.apply(np.asarray(img)))
+        if img.mode == 'P':
+            cropped_img.putpalette(img.getpalette())
+
+        # Save the cropped image to the output folder
+        cropped_img.save(output_path)
+        return False
+
+def crop_chunk(files, output_folder, transform):
+    """
+    Crop a chunk of images, skipping the ones whose output is up to date
+
+    Args:
+        files (list): (file_path, relative_path, mtime) tuples; the output keeps the relative path.
+        output_folder (str): Path to save the cropped images.
+        transform (FrameTransform): Crop and resize to apply.
+
+    Returns:
+        dict: Counts of 'cropped', 'lossless' and 'skipped' images and a list of (file_path, error) 'failures'.
+    """
+    result = {'cropped': 0, 'lossless': 0, 'skipped': 0, 'failures': []}
+    for file_path, relative_path, mtime in files:
+        output_path = os.path.join(output_folder, relative_path)
+        if is_up_to_date(mtime, output_path):
+            result['skipped'] += 1
+            continue
+
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if crop_image(file_path, output_path, transform):
+                result['lossless'] += 1
+            result['cropped'] += 1
+        except Exception as e:
+            result['failures'].append((file_path, str(e)))
+    return result
+
+def crop_images_in_folder(folder_path, output_folder, crop_box, output_size=None, interpolation=None, workers=None,
+                          chunk_size=CHUNK_SIZE):
     """
     Crops all images in the specified folder.
 
+    Files are streamed from os.scandir and handed to a process pool in chunks.
+    Images whose output already exists and is newer than the input are skipped.
+    Frame subdirectories (see iter_image_files) are mirrored in the output folder.
+
     Args:
         folder_path (str): Path to the folder containing images.
         output_folder (str): Path to save the cropped images.
         crop_box (tuple): The crop rectangle, as a (left, upper, right, lower)-tuple.
+        output_size (tuple): Optional (width, height) to resize the cropped images to.
+        interpolation (str): Optional resize interpolation, see transform.INTERPOLATIONS.
+        workers (int): Number of worker processes, 1 to crop in this process (default: CPU count).
+        chunk_size (int): Number of files handed to a worker at a time (default: CHUNK_SIZE).
+
+    Returns:
+        dict: Summary with counts of 'cropped', 'lossless' and 'skipped' images, a list of
+            (file_path, error) 'failures', 'elapsed' seconds and 'files_per_sec'.
     """
+    transform = FrameTransform(crop_box, output_size, interpolation)
+    workers = workers or os.cpu_count() or 1
+
     # Ensure the output folder exists
     os.makedirs(output_folder, exist_ok=True)
 
-    # Loop through all files in the folder
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(('png', 'jpg', 'jpeg', 'bmp', 'tiff', 'gif')):
-            file_path = os.path.join(folder_path, filename)
+    summary = {'cropped': 0, 'lossless': 0, 'skipped': 0, 'failures': []}
 
-            try:
-                with Image.open(file_path) as img:
-                    # Crop the image
-                    cropped_img = img.crop(crop_box)
+    def merge(result):
+        for key in ('cropped', 'lossless', 'skipped'):
+            summary[key] += result[key]
+        summary['failures'].extend(result['failures'])
 
-                    # Save the cropped image to the output folder
-                    output_path = os.path.join(output_folder, filename)
-                    cropped_img.save(output_path)
+    start = time.perf_counter()
+    chunks = iter_chunks(((entry.path, relative_path, entry.stat().st_mtime)
+                          for entry, relative_path in iter_image_files(folder_path)), chunk_size)
 
-                    print(f"Cropped and saved: {output_path}")
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-print(5)
+    if workers == 1:
+        for chunk in chunks:
+            merge(crop_chunk(chunk, output_folder, transform))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number of chunks in flight so the folder is streamed, not listed
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        merge(future.result())
+                pending.add(executor.submit(crop_chunk, chunk, output_folder, transform))
+            for future in pending:
+                merge(future.result())
 
-if __name__ == "__main__":
-    # Input folder containing images
-    folder_path = "path/to/your/image/folder"
-    folder_path = "ex7_11mm_10perc_15012025"
-    print(5)
+    summary['elapsed'] = time.perf_counter() - start
+    processed = summary['cropped'] + len(summary['failures'])
+    summary['files_per_sec'] = processed / summary['elapsed'] if summary['elapsed'] > 0 else 0.0
+
+    print(f"\nCropped {summary['cropped']} images ({summary['lossless']} losslessly) to {output_folder}")
+    print(f"Skipped {summary['skipped']} up-to-date images")
+    print(f"Rate: {summary['files_per_sec']:.1f} files/sec over {summary['elapsed']:.2f} seconds")
+    if summary['failures']:
+        print(f"Failed: {len(summary['failures'])} images")
+        for file_path, error in summary['failures']:
+            print(f"Error processing {file_path}: {error}")
+
+    return summary
 
-    # Output folder for cropped images
-    output_folder = "ex7_11mm_10perc_15012025_cropped"
+def add_arguments(parser):
+    """Add the cropping arguments to an argparse parser"""
+    parser.add_argument('folder_path', type=str, help='Folder containing the images to crop')
+    parser.add_argument('output_folder', type=str, help='Folder to save the cropped images')
+    parser.add_argument('--crop', type=int, nargs=4, required=True, metavar=('LEFT', 'UPPER', 'RIGHT', 'LOWER'),
+                        help='Crop box in pixels')
+    parser.add_argument('--size', type=int, nargs=2, default=None, metavar=('WIDTH', 'HEIGHT'),
+                        help='Resize the cropped images to this size (default: keep the cropped size)')
+    parser.add_argument('--interpolation', choices=INTERPOLATIONS, default=None,
+                        help='Resize interpolation (default: area when shrinking, cubic otherwise)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes, 1 to crop in this process (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'Files handed to a worker at a time (default: {CHUNK_SIZE})')
 
-    # Crop dimensions: (left, upper, right, lower)
-    crop_box = (582, 143, 1600, 670)  # Example crop dimensions
+def run(parser, args):
+    """Validate parsed cropping arguments and crop the folder; exits with 1 if any image failed"""
+    if not os.path.isdir(args.folder_path):
+        parser.error(f"folder not found: {args.folder_path}")
+    if (args.workers is not None and args.workers < 1) or args.chunk_size < 1:
+        parser.error("--workers and --chunk-size must be at least 1")
+    try:
+        FrameTransform(args.crop, args.size, args.interpolation)
+    except ValueError as e:
+        parser.error(str(e))
 
-    crop_images_in_folder(folder_path, output_folder, crop_box)
\ No newline at end of file
+    summary = crop_images_in_folder(args.folder_path, args.output_folder, args.crop, args.size, args.interpolation,
+                                    args.workers, args.chunk_size)
+    if summary['failures']:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Crop (and optionally resize) every image in a folder',
+        epilog='Example: python crop.py frames frames_cropped --crop 582 143 1600 670'
+    )
+    add_arguments(parser)
+    run(parser, parser.parse_args())
+
+if __name__ == "__main__":
+    main()
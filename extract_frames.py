@@ -1,16 +1,57 @@
-import cv2
 import os
 import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import math
+import multiprocessing
 from pathlib import Path
+import queue
 import re
+import shutil
 import sys
+import time
+from ffmpeg_decoder import FFmpegDecoder, ffmpeg_available
+from lazy import lazy_import
+from manifest import ExtractionManifest, video_identity
+from pipeline import run_pipeline
+from progress import ProgressTracker
+from sampling import AdaptiveSampler, SAMPLING_METRICS
+from stats import ExtractionStats, DEFAULT_METRICS_INTERVAL, timed_iter
+from sinks import (ImageSink, NpySink, IMAGE_FORMATS, SINK_FORMATS, DEFAULT_SHARD_SIZE, DEFAULT_WRITE_THREADS,
+                   FSYNC_NONE, FSYNC_POLICIES, is_frame_subdir, make_sink, write_atomic)
+from transform import FrameTransform, INTERPOLATIONS
+
+cv2 = lazy_import('cv2')
+
+# Decoding strategies for the frames between two kept frames
+DECODE_READ = 'read'   # decode and convert every frame (original behaviour)
+DECODE_GRAB = 'grab'   # grab() skipped frames, retrieve() only the kept ones
+DECODE_SEEK = 'seek'   # seek straight to each kept frame
+DECODE_AUTO = 'auto'   # pick grab or seek from the interval
+DECODE_MODES = (DECODE_AUTO, DECODE_READ, DECODE_GRAB, DECODE_SEEK)
+
+# A seek restarts decoding at the nearest keyframe before the target, so it only
+# pays off once the interval is longer than a typical GOP (x264 default keyint)
+SEEK_MIN_INTERVAL = 250
+
+# Libraries decoding the video
+DECODER_OPENCV = 'opencv'   # cv2.VideoCapture, transform in Python
+DECODER_FFMPEG = 'ffmpeg'   # ffmpeg subprocess selecting, cropping and resizing frames itself
+DECODERS = (DECODER_OPENCV, DECODER_FFMPEG)
+
+# Frame timestamps closer than this to a sampling target count as reaching it,
+# so a frame exactly on the target is not lost to floating point rounding
+TIMESTAMP_TOLERANCE_MS = 1e-3
+TIMESTAMPS_NAME = 'timestamps.csv'
+
+DEFAULT_CROP_BOX = (649, 140, 1596, 668) # (left, upper, right, lower)
+DEFAULT_OUTPUT_SIZE = (1024, 512) # (new x dim, new y dim)
 
 def time_to_seconds(time_str):
     """
-    Convert time string in mm:ss format to seconds
+    Convert time string in mm:ss or mm:ss.fff format to seconds
     
     Args:
-        time_str (str): Time in mm:ss format
+        time_str (str): Time in mm:ss format, optionally with a fraction of a second
         
     Returns:
         float: Time in seconds
@@ -18,14 +59,557 @@ def time_to_seconds(time_str):
     if not time_str:
         return None
         
-    match = re.match(r'^(\d+):(\d{2})$', time_str)
+    match = re.match(r'^(\d+):(\d{2})(\.\d+)?$', time_str)
     if not match:
-        raise ValueError("Time must be in mm:ss format (e.g., 1:30)")
+        raise ValueError("Time must be in mm:ss or mm:ss.fff format (e.g., 1:30 or 1:30.250)")
         
-    minutes, seconds = map(int, match.groups())
-    return minutes * 60 + seconds
+    minutes, seconds, fraction = match.groups()
+    if fraction is None:
+        return int(minutes) * 60 + int(seconds)
+    return int(minutes) * 60 + int(seconds) + float(fraction)
+
+def time_value_to_seconds(time_value):
+    """Return a time in mm:ss format or in seconds as seconds, None for a missing time"""
+    return time_to_seconds(time_value) if isinstance(time_value, str) else time_value
+
+def time_to_frame(time_value, fps, default):
+    """
+    Convert a time to a frame number
+
+    Args:
+        time_value (str or float): Time in mm:ss format or in seconds, None for the default
+        fps (float): Frame rate of the video
+        default (int): Frame number returned for a missing time
+
+    Returns:
+        int: Frame number
+    """
+    seconds = time_value_to_seconds(time_value)
+    return int(seconds * fps) if seconds is not None else default
+
+def resolve_decode_mode(decode_mode, frame_interval, adaptive=False):
+    """
+    Resolve the 'auto' decode mode to a concrete strategy
+
+    Args:
+        decode_mode (str): One of DECODE_MODES
+        frame_interval (int): Number of frames between extractions
+        adaptive (bool): True when an AdaptiveSampler picks the kept frames (default: False)
+
+    Returns:
+        str: DECODE_READ, DECODE_GRAB or DECODE_SEEK
+    """
+    if decode_mode not in DECODE_MODES:
+        raise ValueError(f"Decode mode must be one of: {', '.join(DECODE_MODES)}")
+    # Adaptive sampling may keep any candidate, so there is no known frame to seek to
+    if adaptive and decode_mode == DECODE_SEEK:
+        return DECODE_GRAB
+    if decode_mode != DECODE_AUTO:
+        return decode_mode
+    # The sampler skips candidates within its min_interval, which grab() passes over without converting
+    if adaptive:
+        return DECODE_GRAB
+    if frame_interval >= SEEK_MIN_INTERVAL:
+        return DECODE_SEEK
+    return DECODE_GRAB if frame_interval > 1 else DECODE_READ
+
+def resolve_decoder(decoder, opencv_only=False):
+    """
+    Return the decoder actually used for a requested one
+
+    ffmpeg falls back to OpenCV when it is not on the PATH, and when the frame
+    selection needs OpenCV: adaptive sampling compares the uncropped frames
+    between kept ones, and time-based sampling reads each frame's timestamp.
+
+    Args:
+        decoder (str): One of DECODERS
+        opencv_only (bool): Whether the frame selection needs OpenCV (default: False)
+
+    Returns:
+        str: DECODER_OPENCV or DECODER_FFMPEG
+    """
+    if decoder not in DECODERS:
+        raise ValueError(f"Error: Decoder must be one of: {', '.join(DECODERS)}")
+    if decoder == DECODER_FFMPEG and (opencv_only or not ffmpeg_available()):
+        return DECODER_OPENCV
+    return decoder
+
+def iter_kept_frames(cap, start_frame, end_frame, frame_interval, decode_mode=DECODE_AUTO, sampler=None,
+                     stats=None):
+    """
+    Yield every frame_interval-th frame of an opened capture between start and end
+
+    Only the kept frames are converted to BGR images; how the skipped frames are
+    passed over depends on the decode mode. With a sampler, every frame_interval-th
+    frame is only a candidate: it is yielded if the sampler accepts it, and
+    candidates within the sampler's min_interval are grabbed without converting.
+
+    Args:
+        cap (cv2.VideoCapture): Opened video capture
+        start_frame (int): First frame index to consider
+        end_frame (int): Frame index to stop before
+        frame_interval (int): Number of frames between extractions
+        decode_mode (str): One of DECODE_MODES (default: auto)
+        sampler (AdaptiveSampler): Optional sampler choosing which candidates to keep
+        stats (ExtractionStats): Optional stats counting the frames grabbed and decoded
+
+    Yields:
+        tuple: (frame_index, frame)
+    """
+    mode = resolve_decode_mode(decode_mode, frame_interval, sampler is not None)
+    if sampler is not None:
+        sampler.reset()
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_count = start_frame
+
+    while frame_count < end_frame:
+        keep = (frame_count - start_frame) % frame_interval == 0
+        if keep and sampler is not None and not sampler.due(frame_count):
+            keep = False
+
+        if mode == DECODE_READ:
+            ret, frame = cap.read()
+        elif keep:
+            ret, frame = cap.retrieve() if cap.grab() else (False, None)
+        else:
+            ret, frame = cap.grab(), None
+
+        if not ret:
+            break
+        if stats is not None:
+            stats.count_frame(frame is not None)
+
+        if keep and (sampler is None or sampler.accept(frame_count, frame)):
+            yield frame_count, frame
+
+            if mode == DECODE_SEEK and frame_interval > 1:
+                next_frame = frame_count + frame_interval
+                if next_frame >= end_frame:
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, next_frame)
+                # Containers without a usable index may land elsewhere; finish with grab()
+                if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != next_frame:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count + 1)
+                    mode = DECODE_GRAB
+                else:
+                    frame_count = next_frame
+                    continue
+
+        frame_count += 1
+
+def iter_timed_frames(cap, start_time, end_time, every_ms, stats=None):
+    """
+    Yield the first frame at or after each every_ms milliseconds from start_time, by presentation timestamp
+
+    Frames are chosen by their CAP_PROP_POS_MSEC timestamps instead of their
+    frame numbers, so variable frame rate video is sampled evenly in time. The
+    capture grabs forward from the first frame without seeking: OpenCV seeks
+    and numbers frames by the nominal frame rate, which misplaces both in
+    variable frame rate video, so frame indices are counted here instead. Only
+    the kept frames are converted. Targets passed over by a gap between two
+    frames are dropped rather than filled with repeats of the same frame.
+
+    Args:
+        cap (cv2.VideoCapture): Opened video capture, at its first frame
+        start_time (float): Start time in seconds
+        end_time (float): Time in seconds to stop before, None for the end of the video
+        every_ms (float): Milliseconds between kept frames
+        stats (ExtractionStats): Optional stats counting the frames grabbed and decoded
+
+    Yields:
+        tuple: (frame_index, timestamp, frame) with the timestamp in seconds
+    """
+    start_ms = start_time * 1000
+    end_ms = end_time * 1000 if end_time is not None else math.inf
+    next_ms = start_ms
+
+    frame_count = -1
+    while cap.grab():
+        frame_count += 1
+        timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if timestamp_ms >= end_ms - TIMESTAMP_TOLERANCE_MS:
+            break
+
+        keep = timestamp_ms >= next_ms - TIMESTAMP_TOLERANCE_MS
+        frame = None
+        if keep:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+        if stats is not None:
+            stats.count_frame(frame is not None)
+
+        if keep:
+            passed = math.floor((timestamp_ms - start_ms + TIMESTAMP_TOLERANCE_MS) / every_ms)
+            next_ms = start_ms + (passed + 1) * every_ms
+            yield frame_count, timestamp_ms / 1000, frame
+
+def iter_frame_range(video_path, start_frame, end_frame, frame_interval, transform=None, batch_size=None,
+                     decode_mode=DECODE_AUTO, sampler=None, stats=None):
+    """
+    Lazily decode every frame_interval-th frame between two frame numbers
+
+    Args:
+        video_path (str): Path to the video file
+        start_frame (int): First frame index to consider
+        end_frame (int): Frame index to stop before
+        frame_interval (int): Number of frames between yielded frames
+        transform (FrameTransform): Optional crop and resize applied to each frame
+        batch_size (int): If given, yield batches of this many frames instead of single frames
+        decode_mode (str): How skipped frames are decoded, one of DECODE_MODES (default: auto)
+        sampler (AdaptiveSampler): Optional sampler keeping only candidates that changed enough
+        stats (ExtractionStats): Optional stats receiving the decode and transform timings
+
+    Yields:
+        tuple: (frame_index, timestamp, frame) with the timestamp in seconds, or with batch_size
+            (frame_indices, timestamps, batch) where batch is a view of one reused buffer that
+            the next batch overwrites
+    """
+    cap = cv2.VideoCapture(video_path)
+
+    if not cap.isOpened():
+        raise ValueError("Error: Could not open video file")
+
+    try:
+        # The capture still points at the kept frame when its timestamp is read
+        frames = (
+            (frame_count, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, frame)
+            for frame_count, frame in iter_kept_frames(cap, start_frame, end_frame, frame_interval, decode_mode,
+                                                          sampler, stats)
+        )
+        yield from _transform_frames(frames, transform, batch_size, stats)
+    finally:
+        cap.release()
+
+def iter_time_range(video_path, start_time, end_time, every_ms, transform=None, batch_size=None, stats=None):
+    """
+    Lazily decode one frame every every_ms milliseconds between two times, by presentation timestamp
+
+    Args:
+        video_path (str): Path to the video file
+        start_time (float): Start time in seconds
+        end_time (float): Time in seconds to stop before, None for the end of the video
+        every_ms (float): Milliseconds between yielded frames
+        transform (FrameTransform): Optional crop and resize applied to each frame
+        batch_size (int): If given, yield batches of this many frames instead of single frames
+        stats (ExtractionStats): Optional stats receiving the decode and transform timings
+
+    Yields:
+        tuple: As iter_frame_range, with each frame's own timestamp
+    """
+    cap = cv2.VideoCapture(video_path)
+
+    if not cap.isOpened():
+        raise ValueError("Error: Could not open video file")
+
+    try:
+        yield from _transform_frames(iter_timed_frames(cap, start_time, end_time, every_ms, stats), transform,
+                                     batch_size, stats)
+    finally:
+        cap.release()
+
+def _transform_frames(frames, transform, batch_size, stats):
+    """Apply the transform to (frame_index, timestamp, frame) tuples, singly or in batches, timing both stages"""
+    timer = None
+    if stats is not None:
+        frames = timed_iter(frames, stats, 'decode')
+        timer = lambda seconds: stats.add('transform', seconds)
+
+    if batch_size is None:
+        for frame_count, timestamp, frame in frames:
+            if transform is not None and timer is not None:
+                start = time.perf_counter()
+                frame = transform.apply(frame)
+                timer(time.perf_counter() - start)
+            elif transform is not None:
+                frame = transform.apply(frame)
+            yield frame_count, timestamp, frame
+        return
+
+    if transform is None:
+        batch_transform = FrameTransform(batch_size=batch_size)
+    elif transform.batch_size != batch_size:
+        batch_transform = FrameTransform(transform.crop_box, transform.output_size, transform.interpolation,
+                                         batch_size)
+    else:
+        batch_transform = transform
+
+    keyed_frames = (((frame_count, timestamp), frame) for frame_count, timestamp, frame in frames)
+    for keys, batch in batch_transform.iter_batches(keyed_frames, timer):
+        yield [frame_count for frame_count, _ in keys], [timestamp for _, timestamp in keys], batch
+
+def iter_frames(video_path, interval=1, start=None, end=None, transform=None, batch_size=None,
+                decode_mode=DECODE_AUTO, sampler=None, every_ms=None):
+    """
+    Lazily decode frames of a video at a fixed interval, without writing anything to disk
+
+    Args:
+        video_path (str): Path to the video file
+        interval (int): Number of frames between yielded frames (default: 1)
+        start (str or float): Start time in mm:ss format or in seconds (default: None, from the beginning)
+        end (str or float): End time in mm:ss format or in seconds (default: None, until the end)
+        transform (FrameTransform): Optional crop and resize applied to each frame
+        batch_size (int): If given, yield batches of this many frames instead of single frames
+        decode_mode (str): How skipped frames are decoded, one of DECODE_MODES (default: auto)
+        sampler (AdaptiveSampler): Optional sampler keeping only candidates that changed enough
+        every_ms (float): If given, yield one frame every every_ms milliseconds by presentation
+            timestamp instead of every interval-th frame; interval, decode_mode and sampler are ignored
+
+    Yields:
+        tuple: (frame_index, timestamp, frame) with the timestamp in seconds, or with batch_size
+            (frame_indices, timestamps, batch) where batch is a view of one reused buffer that
+            the next batch overwrites
+    """
+    if every_ms is not None:
+        yield from iter_time_range(video_path, time_value_to_seconds(start) or 0, time_value_to_seconds(end),
+                                   every_ms, transform, batch_size)
+        return
+
+    cap = cv2.VideoCapture(video_path)
+
+    if not cap.isOpened():
+        raise ValueError("Error: Could not open video file")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    start_frame = time_to_frame(start, fps, 0)
+    end_frame = time_to_frame(end, fps, total_frames)
+    yield from iter_frame_range(video_path, start_frame, end_frame, interval, transform, batch_size, decode_mode,
+                                sampler)
+
+def split_frame_range(start_frame, end_frame, frame_interval, workers):
+    """
+    Split a frame range into contiguous segments, one per worker
+
+    Every segment starts on a kept frame, so the frames kept by the segments
+    are exactly the frames a sequential run would keep.
+
+    Args:
+        start_frame (int): First frame index of the range
+        end_frame (int): Frame index to stop before
+        frame_interval (int): Number of frames between extractions
+        workers (int): Maximum number of segments
+
+    Returns:
+        list: (segment_start, segment_end) tuples in frame order
+    """
+    kept_frames = math.ceil(max(0, end_frame - start_frame) / frame_interval)
+    kept_per_segment = max(1, math.ceil(kept_frames / workers))
+
+    segments = []
+    for first_kept in range(0, kept_frames, kept_per_segment):
+        segment_start = start_frame + first_kept * frame_interval
+        segment_end = min(end_frame, segment_start + kept_per_segment * frame_interval)
+        segments.append((segment_start, segment_end))
+    return segments
+
+def split_missing_runs(start_frame, end_frame, frame_interval, done_frames):
+    """
+    Split a frame range into segments covering only the kept frames not yet done
 
-def extract_frames(video_path, output_folder, frame_interval, start_time='0:00', end_time=None, progress_callback=None):
+    Args:
+        start_frame (int): First frame index of the range
+        end_frame (int): Frame index to stop before
+        frame_interval (int): Number of frames between extractions
+        done_frames (set): Frame indices that are already extracted
+
+    Returns:
+        list: (segment_start, segment_end) tuples of consecutive missing kept frames
+    """
+    runs = []
+    run_start = None
+    for frame_count in range(start_frame, end_frame, frame_interval):
+        if frame_count in done_frames:
+            if run_start is not None:
+                runs.append((run_start, frame_count))
+                run_start = None
+        elif run_start is None:
+            run_start = frame_count
+    if run_start is not None:
+        runs.append((run_start, end_frame))
+    return runs
+
+def default_transform():
+    """Return the crop and resize applied when extract_frames is not given a transform"""
+    return FrameTransform(DEFAULT_CROP_BOX, DEFAULT_OUTPUT_SIZE)
+
+def extract_segment(video_path, output_folder, start_frame, end_frame, frame_interval, decode_mode=DECODE_AUTO,
+                    report=None, threads=0, queue_size=16, transform=None, sink=None, sampler=None, stats=None,
+                    decoder=None, time_range=None):
+    """
+    Extract the kept frames of one segment of a video with its own capture
+
+    Args:
+        video_path (str): Path to the video file
+        output_folder (str): Path to save extracted frames
+        start_frame (int): First frame index of the segment
+        end_frame (int): Frame index to stop before
+        frame_interval (int): Number of frames between extractions
+        decode_mode (str): How skipped frames are decoded, one of DECODE_MODES
+        report (callable): Optional report(frame_count, output_path, nbytes, timestamp) called per saved frame
+        threads (int): Transform/encode threads behind a decoder thread, 0 to run inline (default: 0)
+        queue_size (int): Depth of the decode and write queues when threads > 0 (default: 16)
+        transform (FrameTransform): Crop and resize to apply (default: default_transform())
+        sink (FrameSink): Destination of the frames, already prepared (default: JPEG files)
+        sampler (AdaptiveSampler): Optional sampler keeping only candidates that changed enough;
+            it starts afresh at the segment start
+        stats (ExtractionStats): Optional stats receiving the stage timings and counts
+        decoder (FFmpegDecoder): Optional ffmpeg decoder applying the transform itself (default: None, OpenCV)
+        time_range (tuple): Optional (start_time, end_time, every_ms) selecting one frame every every_ms
+            milliseconds by timestamp, instead of start_frame, end_frame and frame_interval
+
+    Returns:
+        int: Number of frames saved
+    """
+    if transform is None:
+        transform = default_transform()
+    if sink is None:
+        sink = ImageSink()
+    if stats is None:
+        stats = ExtractionStats()
+
+    # Timestamps of the frames handed to the sink and not reported yet
+    timestamps = {}
+
+    def finish_writes(completed):
+        for frame_count, output_path, nbytes, seconds in completed:
+            stats.add_write(seconds, nbytes)
+            timestamp = timestamps.pop(frame_count, None)
+            if report:
+                report(frame_count, output_path, nbytes, timestamp)
+
+    def save(frame_count, timestamp, payload):
+        timestamps[frame_count] = timestamp
+        finish_writes(sink.write(frame_count, payload))
+
+    sink.open(output_folder)
+    try:
+        if decoder is not None:
+            # Frames come out of ffmpeg cropped and resized, in a ring of reused buffers large
+            # enough for every frame the decode queue, the threads and the write queue may hold
+            buffers = 2 * queue_size + threads + 2 if threads > 0 else 2
+            ffmpeg_frames = decoder.iter_frame_range(video_path, start_frame, end_frame, frame_interval, transform,
+                                                     buffers, stats)
+            transform = FrameTransform()
+
+        if threads > 0:
+            # Transform and encode in the worker threads rather than on the decoder thread
+            if decoder is not None:
+                frames = ffmpeg_frames
+            elif time_range is not None:
+                frames = iter_time_range(video_path, *time_range, stats=stats)
+            else:
+                frames = iter_frame_range(video_path, start_frame, end_frame, frame_interval,
+                                          decode_mode=decode_mode, sampler=sampler, stats=stats)
+
+            def process(item):
+                frame_count, timestamp, frame = item
+                start = time.perf_counter()
+                image = transform.apply(frame)
+                transformed = time.perf_counter()
+                payload = sink.encode(image)
+                stats.add('transform', transformed - start)
+                stats.add('encode', time.perf_counter() - transformed)
+                return frame_count, timestamp, payload
+
+            def sample_queues(decode_depth, write_depth):
+                stats.sample_queue('decode', decode_depth)
+                stats.sample_queue('write', write_depth)
+
+            return run_pipeline(frames, process, lambda result: save(*result), threads, queue_size, queue_size,
+                                sample_queues)
+
+        saved_count = 0
+        if decoder is not None:
+            for frame_count, timestamp, frame in ffmpeg_frames:
+                start = time.perf_counter()
+                payload = sink.encode(frame)
+                stats.add('encode', time.perf_counter() - start)
+                save(frame_count, timestamp, payload)
+                saved_count += 1
+            return saved_count
+
+        if time_range is not None:
+            batches = iter_time_range(video_path, *time_range, transform, transform.batch_size, stats)
+        else:
+            batches = iter_frame_range(video_path, start_frame, end_frame, frame_interval, transform,
+                                       transform.batch_size, decode_mode, sampler, stats)
+        for frame_counts, frame_timestamps, batch in batches:
+            for frame_count, timestamp, frame in zip(frame_counts, frame_timestamps, batch):
+                start = time.perf_counter()
+                payload = sink.encode(frame)
+                stats.add('encode', time.perf_counter() - start)
+                save(frame_count, timestamp, payload)
+                saved_count += 1
+        return saved_count
+    finally:
+        # Frames still being written are only reported once they are on disk
+        finish_writes(sink.close())
+
+def _extract_segment_worker(video_path, output_folder, start_frame, end_frame, frame_interval, decode_mode,
+                            progress_queue, threads, queue_size, transform, sink, sampler, decoder):
+    """Process pool entry point: extract a segment, post progress to a shared queue and return (count, stats)"""
+    def report(frame_count, output_path, nbytes, timestamp):
+        progress_queue.put((frame_count, output_path, nbytes, timestamp))
+
+    stats = ExtractionStats()
+    saved_count = extract_segment(video_path, output_folder, start_frame, end_frame, frame_interval, decode_mode,
+                                  report, threads, queue_size, transform, sink, sampler, stats, decoder)
+    return saved_count, stats
+
+def _extract_segments_parallel(video_path, output_folder, segments, workers, frame_interval, decode_mode, report,
+                               threads, queue_size, transform, sink, sampler, stats, decoder):
+    """Run segments across a process pool, forwarding worker progress to report and merging worker stats"""
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+
+        def drain_progress():
+            while True:
+                try:
+                    report(*progress_queue.get_nowait())
+                except queue.Empty:
+                    return
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+            pending = {
+                executor.submit(_extract_segment_worker, video_path, output_folder, segment_start, segment_end,
+                                frame_interval, decode_mode, progress_queue, threads, queue_size, transform,
+                                sink, sampler, decoder)
+                for segment_start, segment_end in segments
+            }
+            futures = list(pending)
+            while pending:
+                _, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                drain_progress()
+            drain_progress()
+
+        saved_count = 0
+        for future in futures:
+            segment_count, segment_stats = future.result()
+            saved_count += segment_count
+            stats.merge(segment_stats)
+        return saved_count
+
+def write_timestamps(output_folder, timestamps):
+    """
+    Write the presentation timestamp of each saved frame to TIMESTAMPS_NAME in the output folder
+
+    Args:
+        output_folder (str): Folder the frames were saved to
+        timestamps (dict): (timestamp in seconds, output path) of each saved frame by frame index
+    """
+    lines = ['frame,timestamp_ms,path']
+    for frame_count, (timestamp, output_path) in sorted(timestamps.items()):
+        lines.append(f"{frame_count},{timestamp * 1000:.3f},{os.path.relpath(output_path, output_folder)}")
+    write_atomic(os.path.join(output_folder, TIMESTAMPS_NAME), ('\n'.join(lines) + '\n').encode())
+
+def extract_frames(video_path, output_folder, frame_interval, start_time='0:00', end_time=None, progress_callback=None,
+                   decode_mode=DECODE_AUTO, workers=1, threads=0, queue_size=16, transform=None, incremental=False,
+                   progress_events=None, verbose=0, sink=None, sampler=None, metrics_callback=None,
+                   metrics_interval=DEFAULT_METRICS_INTERVAL, decoder=DECODER_OPENCV, every_ms=None):
     """
     Extract frames from a video file at specified intervals
     
@@ -35,25 +619,68 @@ def extract_frames(video_path, output_folder, frame_interval, start_time='0:00',
         frame_interval (int): Number of frames to skip between extractions
         start_time (float): Start time in seconds (default: 0)
         end_time (float): End time in seconds (default: None, process until end)
-        progress_callback (callable): Optional callback function for progress updates
+        progress_callback (callable): Optional callback function for status messages
+        decode_mode (str): How skipped frames are decoded, one of DECODE_MODES (default: auto)
+        workers (int): Number of processes extracting contiguous segments in parallel (default: 1)
+        threads (int): Transform/encode threads per process behind a decoder thread, 0 to run inline (default: 0)
+        queue_size (int): Depth of the decode and write queues when threads > 0 (default: 16)
+        transform (FrameTransform): Crop and resize to apply (default: default_transform())
+        incremental (bool): Keep frames a previous run already wrote with the same video and
+            parameters and extract only the missing ones, instead of clearing the folder (default: False)
+        progress_events (callable): Optional callback receiving rate-limited progress.ProgressEvents
+        verbose (int): 1 to print and report a status line per saved frame and deleted file (default: 0)
+        sink (FrameSink): Destination of the frames, see sinks.make_sink (default: JPEG files)
+        sampler (AdaptiveSampler): Optional sampler that keeps only the frame_interval-th frames
+            that changed enough since the last kept one (default: None, keep them all)
+        metrics_callback (callable): Optional metrics_callback(stats) receiving the live ExtractionStats
+            at most every metrics_interval seconds. With several workers, the stage timings of a
+            segment are only merged in once the segment finishes
+        metrics_interval (float): Minimum seconds between two metrics callbacks (default: 1.0)
+        decoder (str): Library decoding the video, one of DECODERS; ffmpeg falls back to OpenCV
+            when it is not installed or with a sampler (default: opencv)
+        every_ms (float): If given, save one frame every every_ms milliseconds by presentation timestamp
+            instead of every frame_interval-th frame, in one forward pass, and write each saved frame's
+            timestamp to TIMESTAMPS_NAME. Suits variable frame rate video (default: None)
+
+    Returns:
+        stats.ExtractionStats: Stage timings, frame counts, bytes written and queue depths of the extraction
     """
-    START_CROP_Y = 140
-    END_CROP_Y = 668
-    START_CROP_X = 649
-    END_CROP_X = 1596
-    RESIZE_DIM = (1024, 512) # (new x dim, new y dim)
+    if transform is None:
+        transform = default_transform()
+    if sink is None:
+        sink = ImageSink()
+    if incremental and not isinstance(sink, ImageSink):
+        raise ValueError("Error: Resuming is only supported for image file output")
+    if incremental and sampler is not None:
+        raise ValueError("Error: Resuming is not supported with adaptive sampling")
+    if workers < 1:
+        raise ValueError("Workers must be at least 1")
+    if threads < 0 or queue_size < 1:
+        raise ValueError("Threads must be at least 0 and queue size at least 1")
+    if every_ms is not None:
+        if every_ms <= 0:
+            raise ValueError("Error: Sampling period must be positive")
+        if incremental or sampler is not None or workers > 1 or isinstance(sink, NpySink):
+            raise ValueError("Error: Time-based sampling does not support resuming, adaptive sampling, "
+                             "several workers or npy output")
+    used_decoder = resolve_decoder(decoder, sampler is not None or every_ms is not None)
 
     # Create or clear output directory
     output_path = Path(output_folder)
-    if output_path.exists():
+    if output_path.exists() and not incremental:
         print(f"\nClearing existing contents of {output_folder}")
         for file in output_path.glob('*'):
             try:
-                file.unlink()
-                print(f"Deleted: {file}")
+                # Only frame subdirectories of a previous run; unlink() refuses other folders
+                if file.is_dir() and is_frame_subdir(file.name):
+                    shutil.rmtree(file)
+                else:
+                    file.unlink()
+                if verbose:
+                    print(f"Deleted: {file}")
             except Exception as e:
                 print(f"Error deleting {file}: {e}")
-    else:
+    elif not output_path.exists():
         print(f"\nCreating output directory: {output_folder}")
         output_path.mkdir(parents=True, exist_ok=True)
     
@@ -66,85 +693,280 @@ def extract_frames(video_path, output_folder, frame_interval, start_time='0:00',
     # Get video properties
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    cap.release()
     duration = total_frames / fps
     
     print("\nVideo Information:")
     print(f"FPS: {fps:.2f}")
     print(f"Total frames: {total_frames}")
     print(f"Duration: {duration:.2f} seconds")
-    print(f"Extracting every {frame_interval} frames")
+    if every_ms is not None:
+        print(f"Extracting one frame every {every_ms:g} ms by timestamp")
+    else:
+        print(f"Extracting every {frame_interval} frames")
+    if sampler is not None:
+        print(f"Adaptive sampling: {sampler.params()}")
+    if used_decoder != decoder:
+        if sampler is not None:
+            reason = 'adaptive sampling'
+        elif every_ms is not None:
+            reason = 'time-based sampling'
+        else:
+            reason = 'ffmpeg not found'
+        print(f"Decoder: {used_decoder} ({reason})")
+    else:
+        print(f"Decoder: {used_decoder}")
+    if used_decoder == DECODER_OPENCV and every_ms is None:
+        print(f"Decode mode: {resolve_decode_mode(decode_mode, frame_interval, sampler is not None)}")
+    print(f"Workers: {workers}")
+    print(f"Encode threads: {threads if threads > 0 else 'inline'}")
+    print(f"Crop box: {transform.crop_box}, output size: {transform.output_size}")
+    print(f"Output format: {sink.params()}")
     print(f"Output directory: {output_folder}")
     print("\nStarting frame extraction...")
     
-    frame_count = 0
-    saved_count = 0
-    
-    # Convert time strings to seconds
-    start_seconds = time_to_seconds(start_time)
-    end_seconds = time_to_seconds(end_time)
-    
     # Convert times to frame numbers
-    start_frame = int(start_seconds * fps) if start_seconds is not None else 0
-    end_frame = int(end_seconds * fps) if end_seconds is not None else total_frames
+    start_frame = time_to_frame(start_time, fps, 0)
+    end_frame = time_to_frame(end_time, fps, total_frames)
 
     # Calculate total frames to process
     total_frames_to_process = end_frame - start_frame
 
-    # Seek to start position
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-    frame_count = start_frame
+    time_range = None
+    timestamps = {}
+    if every_ms is not None:
+        start_seconds = time_value_to_seconds(start_time) or 0
+        end_seconds = time_value_to_seconds(end_time)
+        time_range = (start_seconds, end_seconds, every_ms)
+        span = (end_seconds if end_seconds is not None else duration) - start_seconds
+        frames_expected = max(0, math.ceil(span * 1000 / every_ms))
+    else:
+        frames_expected = len(range(start_frame, end_frame, frame_interval))
 
-    while frame_count < end_frame:
-        ret, frame = cap.read()
-        
-        if not ret:
-            break
-            
-        if (frame_count - start_frame) % frame_interval == 0:
-            # Crop and resize frame
-            cropped_frame = frame[START_CROP_Y:END_CROP_Y, START_CROP_X:END_CROP_X]
-            resized_frame = cv2.resize(cropped_frame, RESIZE_DIM, interpolation=cv2.INTER_CUBIC)
-
-            # Save frame as image
-            output_path = os.path.join(output_folder, f"frame_{frame_count:06d}.jpg")
-            cv2.imwrite(output_path, resized_frame)
-            saved_count += 1
-            
-            # Calculate and report progress
-            progress = (frame_count - start_frame) / total_frames_to_process * 100
-            status = f"Processing frame {frame_count:06d} ({progress:.1f}%) - Saved to {output_path}"
-            print(status)
-            
-            if progress_callback:
-                progress_callback(status)
-            
-        frame_count += 1
-        
-    cap.release()
+    tracker = ProgressTracker(frames_expected, progress_events)
+    stats = ExtractionStats()
+    last_metrics = time.perf_counter()
+
+    def report(frame_count, output_path, nbytes, timestamp):
+        nonlocal last_metrics
+        tracker.update(frame_count, nbytes)
+        if time_range is not None:
+            timestamps[frame_count] = (timestamp, output_path)
+        if metrics_callback and time.perf_counter() - last_metrics >= metrics_interval:
+            last_metrics = time.perf_counter()
+            metrics_callback(stats)
+        if not verbose:
+            return
+
+        # Calculate and report progress
+        progress = (frame_count - start_frame) / total_frames_to_process * 100
+        status = f"Processing frame {frame_count:06d} ({progress:.1f}%) - Saved to {output_path}"
+        print(status)
+
+        if progress_callback:
+            progress_callback(status)
+
+    manifest = None
+    skipped_count = 0
+    if incremental:
+        manifest = ExtractionManifest(output_folder, sink.file_name)
+        manifest.load()
+
+        wanted_frames = set(range(start_frame, end_frame, frame_interval))
+        params = {'crop_box': transform.crop_box, 'output_size': transform.output_size,
+                  'interpolation': transform.interpolation, 'output': sink.params()}
+        selection = {'frame_interval': frame_interval, 'start_frame': start_frame, 'end_frame': end_frame}
+        # Delete by the recorded paths: the format or subdirectory size may have changed since
+        stale_paths = manifest.reconcile(video_identity(video_path), params, selection, wanted_frames).values()
+        for path in stale_paths:
+            try:
+                os.remove(os.path.join(output_folder, path))
+            except FileNotFoundError:
+                pass
+        for directory in {os.path.dirname(path) for path in stale_paths} - {''}:
+            try:
+                os.rmdir(os.path.join(output_folder, directory))
+            except OSError:
+                # Still holds frames that are kept
+                pass
+
+        skipped_count = len(manifest.frames)
+        tracker.frames_total -= skipped_count
+        print(f"Resuming: {skipped_count} frames already extracted")
+        manifest.begin()
+
+        runs = split_missing_runs(start_frame, end_frame, frame_interval, manifest.frames)
+        segments = [segment for run_start, run_end in runs
+                    for segment in split_frame_range(run_start, run_end, frame_interval, workers)]
+        extract_report = report
+
+        def report(frame_count, output_path, nbytes, timestamp):
+            manifest.record(frame_count)
+            extract_report(frame_count, output_path, nbytes, timestamp)
+    elif time_range is not None:
+        # One forward pass over the whole range; frame numbers are only known once decoded
+        segments = [(start_frame, end_frame)]
+    else:
+        segments = split_frame_range(start_frame, end_frame, frame_interval, workers)
+
+    frame_decoder = FFmpegDecoder(fps, frame_shape) if used_decoder == DECODER_FFMPEG else None
+    # With time-based sampling the frame indices are only known once decoded
+    frame_indices = list(range(start_frame, end_frame, frame_interval)) if time_range is None else []
+    sink.prepare(output_folder, transform.output_shape(frame_shape), frame_indices)
+    try:
+        if len(segments) > 1 and workers > 1:
+            saved_count = _extract_segments_parallel(video_path, output_folder, segments, workers, frame_interval,
+                                                     decode_mode, report, threads, queue_size, transform, sink,
+                                                     sampler, stats, frame_decoder)
+        else:
+            saved_count = sum(
+                extract_segment(video_path, output_folder, segment_start, segment_end, frame_interval, decode_mode,
+                                report, threads, queue_size, transform, sink, sampler, stats, frame_decoder,
+                                time_range)
+                for segment_start, segment_end in segments
+            )
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if time_range is not None:
+            write_timestamps(output_folder, timestamps)
     
+    stats.finish()
+    if metrics_callback:
+        metrics_callback(stats)
+    final_event = tracker.finish()
     final_status = f"\nExtraction complete!\nExtracted {saved_count} frames to {output_folder}\nProcessing rate: {(saved_count/total_frames_to_process)*100:.1f}% of total frames"
+    final_status += f"\nThroughput: {final_event.fps:.1f} frames/sec, {final_event.bytes_written / (1024 * 1024):.1f} MB written"
+    if incremental:
+        final_status += f"\nSkipped {skipped_count} frames extracted by a previous run"
     print(final_status)
     if progress_callback:
         progress_callback(final_status)
+    return stats
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Extract frames from a video file',
-        epilog='Example: python extract_frames.py video.mp4 output_frames --interval 5 --start 1:30 --end 2:45'
-    )
+def add_arguments(parser):
+    """Add the extraction arguments to an argparse parser"""
     parser.add_argument('video_path', type=str, help='Path to the video file')
     parser.add_argument('output_folder', type=str, help='Folder to save extracted frames')
     parser.add_argument('--interval', type=int, default=60,
                         help='Extract every Nth frame (default: 5)')
     parser.add_argument('--start', type=str, default='0:00',
-                        help='Start time in mm:ss format (default: 0:00)')
+                        help='Start time in mm:ss or mm:ss.fff format (default: 0:00)')
     parser.add_argument('--end', type=str, default=None,
-                        help='End time in mm:ss format (default: process until end)')
-    
-    args = parser.parse_args()
-    
-    extract_frames(args.video_path, args.output_folder, args.interval, 
-                  start_time=args.start, end_time=args.end)
+                        help='End time in mm:ss or mm:ss.fff format (default: process until end)')
+    parser.add_argument('--every-ms', type=float, default=None,
+                        help='Extract one frame every N milliseconds by timestamp instead of every --interval-th '
+                             'frame, for variable frame rate video; also writes ' + TIMESTAMPS_NAME)
+    parser.add_argument('--decode-mode', choices=DECODE_MODES, default=DECODE_AUTO,
+                        help='How skipped frames are decoded (default: auto)')
+    parser.add_argument('--decoder', choices=DECODERS, default=DECODER_OPENCV,
+                        help='Library decoding the video; ffmpeg crops and resizes while decoding and falls '
+                             'back to opencv when it is not installed (default: opencv)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes extracting segments in parallel (default: 1)')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='Transform/encode threads behind a decoder thread, 0 to run inline (default: 0)')
+    parser.add_argument('--queue-size', type=int, default=16,
+                        help='Depth of the decode and write queues when --threads is set (default: 16)')
+    parser.add_argument('--crop', type=int, nargs=4, default=DEFAULT_CROP_BOX,
+                        metavar=('LEFT', 'UPPER', 'RIGHT', 'LOWER'),
+                        help='Crop box in pixels (default: %(default)s)')
+    parser.add_argument('--size', type=int, nargs=2, default=DEFAULT_OUTPUT_SIZE, metavar=('WIDTH', 'HEIGHT'),
+                        help='Output frame size (default: %(default)s)')
+    parser.add_argument('--interpolation', choices=INTERPOLATIONS, default=None,
+                        help='Resize interpolation (default: area when shrinking, cubic otherwise)')
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help='Frames transformed per batch buffer (default: 16)')
+    parser.add_argument('--write-threads', type=int, default=DEFAULT_WRITE_THREADS,
+                        help=f'Threads writing image files, 0 to write synchronously (default: {DEFAULT_WRITE_THREADS})')
+    parser.add_argument('--subdir-size', type=int, default=None,
+                        help='Spread image files over subdirectories of this many frame indices each '
+                             '(default: all files in the output folder)')
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_NONE,
+                        help='Flush image files to disk: none, each file before it is renamed, '
+                             'or once at the end (default: none)')
+    parser.add_argument('--adaptive', choices=SAMPLING_METRICS, default=None,
+                        help='Keep a frame only when it changed enough since the last kept one, '
+                             'comparing every --interval-th frame with this metric')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='Change needed to keep a frame (default: 3.0 for mad, 5 bits for dhash)')
+    parser.add_argument('--min-interval', type=int, default=1,
+                        help='Minimum frames between two adaptively kept frames (default: 1)')
+    parser.add_argument('--max-interval', type=int, default=None,
+                        help='Keep a frame at least this often with adaptive sampling (default: no limit)')
+    parser.add_argument('--format', choices=SINK_FORMATS, default='jpg',
+                        help='Output format: image files, one memory-mapped npy array or tar shards (default: jpg)')
+    parser.add_argument('--quality', type=int, default=None,
+                        help='JPEG quality (0-100) or WebP quality (1-100, above 100 for lossless)')
+    parser.add_argument('--png-compression', type=int, default=None,
+                        help='PNG compression level (0-9)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f'Frames per tar shard (default: {DEFAULT_SHARD_SIZE})')
+    parser.add_argument('--shard-format', choices=IMAGE_FORMATS, default='jpg',
+                        help='Image format inside tar shards (default: jpg)')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='Print a status line per saved frame')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print per-stage timings, frame counts and queue depths at the end')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep frames already extracted with the same video and settings and extract only '
+                             'the missing ones, instead of clearing the output folder')
+
+def run(parser, args):
+    """
+    Validate parsed extraction arguments and run the extraction
+
+    Arguments are checked before OpenCV is loaded, so mistakes are reported
+    without the startup cost of an extraction.
+    """
+    if not os.path.isfile(args.video_path):
+        parser.error(f"video file not found: {args.video_path}")
+    if args.interval < 1:
+        parser.error("--interval must be at least 1")
+    if args.every_ms is not None and args.every_ms <= 0:
+        parser.error("--every-ms must be positive")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.threads < 0:
+        parser.error("--threads must be at least 0")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if args.resume and args.adaptive:
+        parser.error("--resume is not supported with --adaptive")
+    if args.every_ms is not None and (args.workers > 1 or args.resume or args.adaptive):
+        parser.error("--every-ms does not support --workers above 1, --resume or --adaptive")
+    try:
+        for time_str in (args.start, args.end):
+            time_to_seconds(time_str)
+        transform = FrameTransform(args.crop, args.size, args.interpolation, args.batch_size)
+        sink = make_sink(args.format, args.quality, args.png_compression, args.shard_size, args.shard_format,
+                         args.write_threads, args.subdir_size, args.fsync)
+        sampler = None
+        if args.adaptive:
+            sampler = AdaptiveSampler(args.adaptive, args.threshold, args.min_interval, args.max_interval, args.crop)
+    except ValueError as e:
+        parser.error(str(e).removeprefix("Error: "))
+    if args.resume and not isinstance(sink, ImageSink):
+        parser.error(f"--resume is not supported with --format {args.format}")
+    if args.every_ms is not None and isinstance(sink, NpySink):
+        parser.error("--every-ms is not supported with --format npy")
+
+    stats = extract_frames(args.video_path, args.output_folder, args.interval, 
+                  start_time=args.start, end_time=args.end, decode_mode=args.decode_mode, workers=args.workers,
+                  threads=args.threads, queue_size=args.queue_size, transform=transform,
+                  incremental=args.resume, verbose=args.verbose, sink=sink, sampler=sampler, decoder=args.decoder,
+                  every_ms=args.every_ms)
+    if args.stats:
+        print(f"\nStage statistics:\n{stats}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Extract frames from a video file',
+        epilog='Example: python extract_frames.py video.mp4 output_frames --interval 5 --start 1:30 --end 2:45'
+    )
+    add_arguments(parser)
+    run(parser, parser.parse_args())
 
 if __name__ == "__main__":
     main()
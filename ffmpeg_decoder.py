@@ -0,0 +1,171 @@
+import shutil
+import subprocess
+import tempfile
+import time
+from lazy import lazy_import
+from transform import INTERPOLATIONS
+
+np = lazy_import('numpy')
+cv2 = lazy_import('cv2')
+
+FFMPEG = 'ffmpeg'
+# ffmpeg scaler matching each transform.INTERPOLATIONS name
+SWS_FLAGS = {
+    'nearest': 'neighbor',
+    'linear': 'bilinear',
+    'cubic': 'bicubic',
+    'area': 'area',
+    'lanczos': 'lanczos',
+}
+
+def ffmpeg_available():
+    """Return True if an ffmpeg executable is on the PATH"""
+    return shutil.which(FFMPEG) is not None
+
+def _read_into(stream, buffer):
+    """Fill buffer from stream; return the number of bytes read, short only at the end of the stream"""
+    view = memoryview(buffer).cast('B')
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+class FFmpegDecoder:
+    """
+    Decode kept frames with an ffmpeg subprocess instead of OpenCV
+
+    ffmpeg seeks to the start frame, drops the frames between kept ones in its
+    select filter, crops and resizes the kept ones in the same filter graph and
+    pipes them out as raw BGR. The frame indices match the OpenCV path for
+    constant frame rate video; pixels can differ slightly, as ffmpeg converts
+    from YUV and scales with its own code.
+    """
+
+    def __init__(self, fps, source_shape):
+        """
+        Args:
+            fps (float): Frame rate of the video
+            source_shape (tuple): Shape of a decoded frame (height, width, channels)
+        """
+        self.fps = fps
+        self.source_shape = tuple(source_shape)
+
+    def params(self):
+        return {'decoder': FFMPEG, 'fps': self.fps, 'source_shape': self.source_shape}
+
+    def scale_flags(self, transform):
+        """Return the ffmpeg scaler flags matching the interpolation the transform would use"""
+        interpolation = transform.resolve_interpolation(self.source_shape)
+        for name, flag_name in INTERPOLATIONS.items():
+            if getattr(cv2, flag_name) == interpolation:
+                return SWS_FLAGS[name]
+        return SWS_FLAGS['area']
+
+    def command(self, video_path, start_frame, frame_count, frame_interval, transform):
+        """
+        Build the ffmpeg command outputting frame_count frames, every frame_interval-th from start_frame
+
+        The seek point is half a frame before start_frame, so ffmpeg's accurate
+        seeking drops every frame before it and start_frame is the first frame
+        the select filter sees. Only the selected frames are cropped, scaled and
+        converted to BGR.
+
+        Args:
+            video_path (str): Path to the video file
+            start_frame (int): First frame index to output
+            frame_count (int): Number of frames to output
+            frame_interval (int): Number of frames between output frames
+            transform (FrameTransform): Crop and resize to apply
+
+        Returns:
+            list: Command line arguments
+        """
+        command = [FFMPEG, '-hide_banner', '-loglevel', 'error', '-nostdin']
+        if start_frame > 0:
+            command += ['-ss', f"{(start_frame - 0.5) / self.fps:.6f}"]
+        command += ['-i', video_path]
+
+        filters = []
+        if frame_interval > 1:
+            filters.append(f"select=not(mod(n\\,{frame_interval}))")
+        if transform.crop_box is not None:
+            crop_width, crop_height = transform.crop_size(self.source_shape)
+            left, upper = transform.crop_box[:2]
+            # exact=1 keeps ffmpeg from rounding odd offsets and sizes down to the chroma grid
+            filters.append(f"crop={crop_width}:{crop_height}:{left}:{upper}:exact=1")
+        if transform.output_size is not None:
+            width, height = transform.output_size
+            filters.append(f"scale={width}:{height}:flags={self.scale_flags(transform)}")
+        if filters:
+            command += ['-vf', ','.join(filters)]
+
+        # passthrough keeps ffmpeg from duplicating or dropping frames to fit a frame rate
+        command += ['-fps_mode', 'passthrough', '-frames:v', str(frame_count), '-an', '-sn',
+                    '-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+        return command
+
+    def iter_frame_range(self, video_path, start_frame, end_frame, frame_interval, transform, buffers=2,
+                         stats=None):
+        """
+        Decode every frame_interval-th frame between two frame numbers through an ffmpeg pipe
+
+        Frames are read straight into a ring of preallocated buffers and come
+        out already cropped and resized. A yielded frame stays valid until
+        buffers - 1 more frames have been yielded.
+
+        Args:
+            video_path (str): Path to the video file
+            start_frame (int): First frame index to consider
+            end_frame (int): Frame index to stop before
+            frame_interval (int): Number of frames between yielded frames
+            transform (FrameTransform): Crop and resize applied by ffmpeg
+            buffers (int): Number of frames in the buffer ring (default: 2)
+            stats (ExtractionStats): Optional stats receiving the decode timings and counts
+
+        Yields:
+            tuple: (frame_index, timestamp, frame) with the timestamp in seconds
+
+        Raises:
+            ValueError: If ffmpeg fails or outputs fewer frames of the expected size than requested
+        """
+        frame_indices = range(start_frame, end_frame, frame_interval)
+        if not frame_indices:
+            return
+
+        ring = np.empty((buffers,) + transform.output_shape(self.source_shape), dtype=np.uint8)
+        command = self.command(video_path, start_frame, len(frame_indices), frame_interval, transform)
+
+        with tempfile.TemporaryFile() as errors:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors, bufsize=0)
+            killed = False
+            received = 0
+            try:
+                for position, frame_index in enumerate(frame_indices):
+                    frame = ring[position % buffers]
+                    start = time.perf_counter()
+                    if _read_into(process.stdout, frame) < frame.nbytes:
+                        break
+                    received += 1
+                    if stats is not None:
+                        stats.add('decode', time.perf_counter() - start)
+                        stats.count_frame(True)
+                    yield frame_index, frame_index / self.fps, frame
+            finally:
+                # Stopped early by the caller: ffmpeg would block writing to the closed pipe
+                if process.poll() is None:
+                    process.kill()
+                    killed = True
+                process.stdout.close()
+                returncode = process.wait()
+
+            if returncode != 0 and not killed:
+                errors.seek(0)
+                message = errors.read().decode(errors='replace').strip()
+                raise ValueError(f"Error: ffmpeg failed with exit code {returncode}: {message}")
+            # Fewer or smaller frames than requested would leave the remaining frames misaligned
+            if received < len(frame_indices):
+                raise ValueError(f"Error: ffmpeg output {received} of {len(frame_indices)} frames "
+                                 f"of shape {frame.shape}")
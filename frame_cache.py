@@ -0,0 +1,135 @@
+import cv2
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+# Frames kept decoded behind and ahead of the playhead; at 960x540 RGB the
+# default window takes ~140 MB, which fits the default cache
+DEFAULT_BEHIND = 30
+DEFAULT_AHEAD = 60
+
+class FrameCache:
+    """
+    Thread-safe LRU cache of decoded frames keyed by frame index, capped by total bytes
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, index):
+        with self._lock:
+            return index in self._frames
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frames)
+
+    def get(self, index):
+        """Return the cached frame for index, or None, marking it as recently used"""
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        """Cache a frame, evicting the least recently used frames beyond max_bytes"""
+        with self._lock:
+            old = self._frames.pop(index, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._frames[index] = frame
+            self._bytes += frame.nbytes
+
+            while self._bytes > self.max_bytes and len(self._frames) > 1:
+                _, evicted = self._frames.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+class FrameReadAhead:
+    """
+    Background thread keeping the frames around the playhead decoded in a FrameCache
+
+    The thread uses its own capture, so it never moves the player's read position.
+    Frames ahead of the playhead are filled first, then the frames behind it are
+    decoded forward from a single seek, so stepping backwards over a long GOP
+    costs one keyframe decode instead of one per step.
+    """
+
+    def __init__(self, video_path, cache, prepare, behind=DEFAULT_BEHIND, ahead=DEFAULT_AHEAD):
+        """
+        Args:
+            video_path (str): Path to the video file
+            cache (FrameCache): Cache to fill
+            prepare (callable): prepare(frame) -> cached frame, applied to each decoded BGR frame
+            behind (int): Frames to keep decoded before the playhead (default: DEFAULT_BEHIND)
+            ahead (int): Frames to keep decoded from the playhead on (default: DEFAULT_AHEAD)
+        """
+        self.video_path = video_path
+        self.cache = cache
+        self.prepare = prepare
+        self.behind = behind
+        self.ahead = ahead
+        self._playhead = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread and wait for it, so no frame of this video reaches the cache afterwards"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def set_playhead(self, index):
+        """Move the window to be filled around index"""
+        self._playhead = index
+        self._wake.set()
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        try:
+            while not self._stop.is_set():
+                self._wake.wait()
+                self._wake.clear()
+                playhead = self._playhead
+                if self._fill(cap, playhead, min(total_frames, playhead + self.ahead)):
+                    self._fill(cap, max(0, playhead - self.behind), playhead)
+        finally:
+            cap.release()
+
+    def _fill(self, cap, start, end):
+        """Decode the uncached frames in [start, end); return False if interrupted by a new playhead"""
+        first_missing = next((index for index in range(start, end) if index not in self.cache), None)
+        if first_missing is None:
+            return True
+
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != first_missing:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first_missing)
+
+        for index in range(first_missing, end):
+            if self._wake.is_set():
+                return False
+
+            if index in self.cache:
+                if not cap.grab():
+                    break
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.cache.put(index, self.prepare(frame))
+        return True
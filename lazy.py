@@ -0,0 +1,31 @@
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """
+    Import a module on first attribute access instead of now
+
+    OpenCV, NumPy and Pillow take most of the startup time of the scripts, so
+    modules bind them through lazy_import and commands that never touch an
+    image (--help, argument errors, time parsing) do not pay for them. The
+    module is registered in sys.modules, so later plain imports get the same
+    object.
+
+    Args:
+        name (str): Absolute module name, e.g. 'cv2' or 'PIL.Image'
+
+    Returns:
+        module: The module, loaded when one of its attributes is first used
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
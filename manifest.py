@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = '.extract_manifest.json'
+# Append-only journal of frames written since the manifest was last saved
+JOURNAL_NAME = '.extract_manifest.log'
+MANIFEST_VERSION = 2
+
+# Bytes hashed from each end of the video; hashing whole multi-GB recordings would
+# cost more than the frames it saves from re-extraction
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def video_identity(video_path):
+    """
+    Identify a video file by size, modification time and a hash of its ends
+
+    Args:
+        video_path (str): Path to the video file
+
+    Returns:
+        dict: 'size', 'mtime' and 'hash' of the file
+    """
+    stat = os.stat(video_path)
+    digest = hashlib.sha1()
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(HASH_CHUNK_SIZE))
+        if stat.st_size > 2 * HASH_CHUNK_SIZE:
+            f.seek(-HASH_CHUNK_SIZE, os.SEEK_END)
+            digest.update(f.read(HASH_CHUNK_SIZE))
+
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest.hexdigest()}
+
+class ExtractionManifest:
+    """
+    Record of what an output folder already holds, used to resume extraction
+
+    The manifest stores the video identity, the parameters that determine the
+    content of each frame file and the frame indices already written with the
+    path each was written to, so stale frames are found and deleted even after
+    the naming changed. Frames are recorded in an append-only journal as they
+    are saved, so a crashed run loses at most the frame being written; the
+    journal is folded back into the manifest on the next load.
+    """
+
+    def __init__(self, output_folder, frame_name):
+        """
+        Args:
+            output_folder (str): Folder holding the extracted frames
+            frame_name (callable): frame_name(frame_count) -> path of a frame relative to the folder
+        """
+        self.output_folder = output_folder
+        self.frame_name = frame_name
+        self.manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+        self.journal_path = os.path.join(output_folder, JOURNAL_NAME)
+        self.video = None
+        self.params = None
+        self.selection = None
+        # Frame index -> path of its file relative to the output folder
+        self.frames = {}
+        self._journal = None
+
+    def load(self):
+        """Read the manifest and journal, if present, keeping only frames whose files still exist"""
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+
+        if data.get('version') != MANIFEST_VERSION:
+            return
+
+        self.video = data['video']
+        self.params = data['params']
+        self.selection = data.get('selection')
+        self.frames = {int(frame): path for frame, path in data['frames'].items()}
+
+        try:
+            with open(self.journal_path) as f:
+                for line in f:
+                    # A crash can leave the last line incomplete
+                    frame, _, path = line.partition('\t')
+                    if frame.isdigit() and path.endswith('\n'):
+                        self.frames[int(frame)] = path[:-1]
+        except FileNotFoundError:
+            pass
+
+        # Paths may include a subdirectory; list each folder holding recorded frames once
+        existing = set()
+        for directory in {os.path.dirname(path) for path in self.frames.values()}:
+            try:
+                with os.scandir(os.path.join(self.output_folder, directory)) as entries:
+                    existing.update(os.path.join(directory, entry.name) for entry in entries)
+            except FileNotFoundError:
+                pass
+        self.frames = {frame: path for frame, path in self.frames.items() if path in existing}
+
+    def reconcile(self, video, params, selection, wanted_frames):
+        """
+        Drop recorded frames that are stale or no longer wanted
+
+        A different video or different content parameters invalidate every
+        recorded frame. Otherwise only frames outside the new selection or
+        recorded under a different name are dropped, and frames already written
+        keep their files.
+
+        Args:
+            video (dict): Identity of the video, from video_identity
+            params (dict): Parameters that determine the content of a frame file
+            selection (dict): Parameters that determine which frames are extracted
+            wanted_frames (set): Frame indices the new selection extracts
+
+        Returns:
+            dict: Frame index -> recorded path relative to the output folder, for the files to delete
+        """
+        params = json.loads(json.dumps(params))
+        if video != self.video or params != self.params:
+            stale = dict(self.frames)
+        else:
+            stale = {frame: path for frame, path in self.frames.items()
+                     if frame not in wanted_frames or path != self.frame_name(frame)}
+
+        self.video = video
+        self.params = params
+        self.selection = selection
+        self.frames = {frame: path for frame, path in self.frames.items() if frame not in stale}
+        return stale
+
+    def _save(self):
+        """Atomically write the manifest"""
+        data = {
+            'version': MANIFEST_VERSION,
+            'video': self.video,
+            'params': self.params,
+            'selection': self.selection,
+            'frames': {str(frame): self.frames[frame] for frame in sorted(self.frames)},
+        }
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def begin(self):
+        """Save the manifest and start a fresh journal for the frames written from now on"""
+        self._save()
+        self._journal = open(self.journal_path, 'w')
+
+    def record(self, frame_count):
+        """Record a frame as written under its current name"""
+        path = self.frame_name(frame_count)
+        self.frames[frame_count] = path
+        self._journal.write(f"{frame_count}\t{path}\n")
+        self._journal.flush()
+
+    def close(self):
+        """Fold the journal into the manifest"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            self._save()
+            os.remove(self.journal_path)
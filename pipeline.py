@@ -0,0 +1,115 @@
+import queue
+import threading
+
+# Marks the end of a queue's input
+_DONE = object()
+
+# How often blocked stages wake up to check whether the pipeline was stopped
+_POLL_SECONDS = 0.1
+
+def _put(q, item, stop):
+    """Put an item on a bounded queue, giving up once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop):
+    """Get an item from a queue, returning _DONE once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+def run_pipeline(items, process, write, workers=4, decode_queue_size=16, write_queue_size=16, sample_queues=None):
+    """
+    Run items through decode, process and write stages connected by bounded queues
+
+    A decoder thread iterates items, a pool of worker threads applies process to
+    each one and the calling thread passes the results to write. Full queues
+    block the stage feeding them, so at most decode_queue_size + workers +
+    write_queue_size items are in flight. Results are written in completion
+    order, not input order.
+
+    Args:
+        items (iterable): Input items, consumed in the decoder thread
+        process (callable): process(item) -> result, run in the worker threads
+        write (callable): write(result), run in the calling thread
+        workers (int): Number of worker threads (default: 4)
+        decode_queue_size (int): Maximum items waiting for a worker (default: 16)
+        write_queue_size (int): Maximum results waiting to be written (default: 16)
+        sample_queues (callable): Optional sample_queues(decode_depth, write_depth) called before each write
+
+    Returns:
+        int: Number of results written
+    """
+    if workers < 1:
+        raise ValueError("Pipeline needs at least one worker")
+
+    decode_queue = queue.Queue(maxsize=decode_queue_size)
+    write_queue = queue.Queue(maxsize=write_queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def fail(e):
+        errors.append(e)
+        stop.set()
+
+    def decode():
+        try:
+            for item in items:
+                if not _put(decode_queue, item, stop):
+                    return
+        except Exception as e:
+            fail(e)
+        finally:
+            for _ in range(workers):
+                _put(decode_queue, _DONE, stop)
+
+    def work():
+        try:
+            while True:
+                item = _get(decode_queue, stop)
+                if item is _DONE:
+                    break
+                if not _put(write_queue, process(item), stop):
+                    break
+        except Exception as e:
+            fail(e)
+        finally:
+            _put(write_queue, _DONE, stop)
+
+    threads = [threading.Thread(target=decode, daemon=True)]
+    threads += [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    written = 0
+    finished_workers = 0
+    try:
+        while finished_workers < workers:
+            result = _get(write_queue, stop)
+            if result is _DONE:
+                if stop.is_set():
+                    break
+                finished_workers += 1
+                continue
+            if sample_queues:
+                sample_queues(decode_queue.qsize(), write_queue.qsize())
+            write(result)
+            written += 1
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return written
@@ -0,0 +1,128 @@
+import cv2
+import threading
+import time
+from collections import deque
+
+DEFAULT_BUFFER_SIZE = 8
+# Longest run of late frames skipped in a row, as a fraction of a second, so a
+# source that decodes slower than real time still shows a few frames per second
+MAX_SKIP_SECONDS = 0.25
+
+class PlaybackEngine:
+    """
+    Decode and prepare playback frames on a producer thread, paced by a wall clock
+
+    The producer fills a small ring buffer with prepared (index, frame) pairs. The
+    clock says which frame is due; frames the producer is already late for are
+    grabbed without being converted, and the presenter drops buffered frames that
+    are older than the one due, so playback holds real time when decoding or the
+    UI falls behind.
+    """
+
+    def __init__(self, video_path, prepare, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Args:
+            video_path (str): Path to the video file
+            prepare (callable): prepare(frame) -> display frame, applied to each decoded BGR frame
+            buffer_size (int): Maximum prepared frames waiting to be presented (default: DEFAULT_BUFFER_SIZE)
+        """
+        self.prepare = prepare
+        self.buffer_size = buffer_size
+        self.cap = cv2.VideoCapture(video_path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._finished = False
+        self._start_index = 0
+        self._start_clock = 0.0
+
+    def start(self, index):
+        """Start playing from frame index, restarting the producer if it is running"""
+        self.stop()
+        self._frames.clear()
+        self._finished = False
+        self._start_index = index
+        self._start_clock = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(index, self._stop), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the producer and wait for it to exit"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def release(self):
+        self.stop()
+        self.cap.release()
+
+    @property
+    def finished(self):
+        """True once the producer reached the end of the video and every frame was taken"""
+        with self._cond:
+            return self._finished and not self._frames
+
+    def clock_index(self):
+        """Return the index of the frame due now"""
+        return self._start_index + int((time.perf_counter() - self._start_clock) * self.fps)
+
+    def next_frame_delay(self):
+        """Return the milliseconds until the frame after the one due now is due"""
+        next_index = self.clock_index() + 1
+        due = self._start_clock + (next_index - self._start_index) / self.fps
+        return max(1, int((due - time.perf_counter()) * 1000))
+
+    def take(self, target):
+        """
+        Return the newest buffered frame not after target, dropping the older ones
+
+        Args:
+            target (int): Index of the frame due now
+
+        Returns:
+            tuple: (index, frame), or None if no due frame is buffered yet
+        """
+        with self._cond:
+            item = None
+            while self._frames and self._frames[0][0] <= target:
+                item = self._frames.popleft()
+            self._cond.notify_all()
+            return item
+
+    def _produce(self, index, stop):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        max_skipped = max(1, int(self.fps * MAX_SKIP_SECONDS))
+        skipped = 0
+        while not stop.is_set():
+            with self._cond:
+                while len(self._frames) >= self.buffer_size and not stop.is_set():
+                    self._cond.wait()
+            if stop.is_set():
+                break
+
+            # Too late to be shown: skip the conversion and resize
+            if index < self.clock_index() and skipped < max_skipped:
+                if not self.cap.grab():
+                    break
+                index += 1
+                skipped += 1
+                continue
+            skipped = 0
+
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            frame = self.prepare(frame)
+            with self._cond:
+                self._frames.append((index, frame))
+            index += 1
+
+        with self._cond:
+            if not stop.is_set():
+                self._finished = True
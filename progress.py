@@ -0,0 +1,114 @@
+import queue
+import time
+
+# Minimum seconds between two progress events, so a fast extraction does not
+# flood the consumer with one event per frame
+DEFAULT_EVENT_INTERVAL = 0.1
+
+class ProgressEvent:
+    """
+    Snapshot of an extraction's progress
+
+    Attributes:
+        frames_done (int): Frames saved so far
+        frames_total (int): Frames the extraction is expected to save
+        frame_index (int): Index in the video of the last saved frame
+        bytes_written (int): Bytes of frame data written so far
+        elapsed (float): Seconds since the extraction started
+        fps (float): Frames saved per second
+        eta (float): Estimated seconds remaining, None until the rate is known
+        finished (bool): True for the last event of an extraction
+    """
+
+    def __init__(self, frames_done, frames_total, frame_index, bytes_written, elapsed, finished=False):
+        self.frames_done = frames_done
+        self.frames_total = frames_total
+        self.frame_index = frame_index
+        self.bytes_written = bytes_written
+        self.elapsed = elapsed
+        self.fps = frames_done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, frames_total - frames_done)
+        self.eta = remaining / self.fps if self.fps > 0 else None
+        self.finished = finished
+
+    @property
+    def percent(self):
+        return self.frames_done / self.frames_total * 100 if self.frames_total else 100.0
+
+    def __str__(self):
+        eta = f"{self.eta:.0f}s" if self.eta is not None else "--"
+        return (f"{self.frames_done}/{self.frames_total} frames ({self.percent:.1f}%), {self.fps:.1f} frames/sec, "
+                f"ETA {eta}, {self.bytes_written / (1024 * 1024):.1f} MB written")
+
+class ProgressTracker:
+    """
+    Count saved frames and emit rate-limited ProgressEvents
+    """
+
+    def __init__(self, frames_total, on_event=None, min_interval=DEFAULT_EVENT_INTERVAL):
+        """
+        Args:
+            frames_total (int): Frames the extraction is expected to save
+            on_event (callable): Optional on_event(event) receiving ProgressEvents
+            min_interval (float): Minimum seconds between two events (default: DEFAULT_EVENT_INTERVAL)
+        """
+        self.frames_total = frames_total
+        self.on_event = on_event
+        self.min_interval = min_interval
+        self.frames_done = 0
+        self.bytes_written = 0
+        self.frame_index = None
+        self._start = time.perf_counter()
+        self._last_event = 0.0
+
+    def event(self, finished=False):
+        """Return a ProgressEvent for the current state"""
+        return ProgressEvent(self.frames_done, self.frames_total, self.frame_index, self.bytes_written,
+                             time.perf_counter() - self._start, finished)
+
+    def update(self, frame_index, nbytes):
+        """Record a saved frame, emitting an event if min_interval has passed since the last one"""
+        self.frames_done += 1
+        self.bytes_written += nbytes
+        self.frame_index = frame_index
+
+        now = time.perf_counter()
+        if self.on_event and now - self._last_event >= self.min_interval:
+            self._last_event = now
+            self.on_event(self.event())
+
+    def finish(self):
+        """Emit the final event"""
+        event = self.event(finished=True)
+        if self.on_event:
+            self.on_event(event)
+        return event
+
+class ProgressChannel:
+    """
+    Thread-safe queue carrying progress from a worker thread to a consumer such as the Tk loop
+
+    Workers post (kind, payload) items; the consumer drains everything posted
+    since its last drain in one call.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def post(self, kind, payload=None):
+        self._queue.put((kind, payload))
+
+    def post_event(self, event):
+        self.post('progress', event)
+
+    def post_message(self, message):
+        self.post('message', message)
+
+    def drain(self):
+        """Return every (kind, payload) item posted since the last drain"""
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
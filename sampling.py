@@ -0,0 +1,95 @@
+from lazy import lazy_import
+from transform import FrameTransform
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+SAMPLING_METRICS = ('mad', 'dhash')
+# Change needed to keep a frame: mean absolute grayscale difference (0-255) for
+# 'mad', number of differing bits of the 64-bit difference hash for 'dhash'
+DEFAULT_THRESHOLDS = {'mad': 3.0, 'dhash': 5}
+MAD_SIZE = (64, 36) # (width, height)
+DHASH_SIZE = (9, 8) # one extra column: each bit compares two neighbours
+
+class AdaptiveSampler:
+    """
+    Keep a frame only when it differs enough from the last kept frame
+
+    Frames are compared on a small grayscale copy of the crop region, so the
+    metric costs a fraction of decoding the frame. Frames less than
+    min_interval after the last kept one are not even needed, which lets the
+    decoder grab them without converting.
+    """
+
+    def __init__(self, metric='mad', threshold=None, min_interval=1, max_interval=None, crop_box=None):
+        """
+        Args:
+            metric (str): One of SAMPLING_METRICS (default: mad)
+            threshold (float): Change needed to keep a frame (default: DEFAULT_THRESHOLDS[metric])
+            min_interval (int): Minimum frames between two kept frames (default: 1)
+            max_interval (int): Keep a frame at least this often even without change, None for no limit
+            crop_box (tuple): Region compared as a (left, upper, right, lower)-tuple, None for the whole frame
+        """
+        if metric not in SAMPLING_METRICS:
+            raise ValueError(f"Error: Sampling metric must be one of: {', '.join(SAMPLING_METRICS)}")
+        if min_interval < 1 or (max_interval is not None and max_interval < min_interval):
+            raise ValueError("Error: Minimum interval must be at least 1 and at most the maximum interval")
+
+        self.metric = metric
+        self.threshold = threshold if threshold is not None else DEFAULT_THRESHOLDS[metric]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.region = FrameTransform(crop_box)
+        self.reset()
+
+    def params(self):
+        """Return the settings that determine the kept frames"""
+        return {'metric': self.metric, 'threshold': self.threshold, 'min_interval': self.min_interval,
+                'max_interval': self.max_interval, 'crop_box': self.region.crop_box}
+
+    def reset(self):
+        """Forget the last kept frame, so the next frame offered is kept"""
+        self._last_index = None
+        self._last_signature = None
+
+    def due(self, frame_index):
+        """Return False if frame_index is too close to the last kept frame to be considered"""
+        return self._last_index is None or frame_index - self._last_index >= self.min_interval
+
+    def signature(self, frame):
+        """Return the downscaled grayscale representation of a BGR frame compared by the metric"""
+        size = MAD_SIZE if self.metric == 'mad' else DHASH_SIZE
+        small = cv2.resize(self.region.crop(frame), size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.metric == 'dhash':
+            return gray[:, 1:] > gray[:, :-1]
+        return gray
+
+    def difference(self, a, b):
+        """Return the change between two signatures"""
+        if self.metric == 'dhash':
+            return int(np.count_nonzero(a != b))
+        return float(cv2.absdiff(a, b).mean())
+
+    def accept(self, frame_index, frame):
+        """
+        Decide whether to keep a frame, remembering it if kept
+
+        Args:
+            frame_index (int): Index of the frame in the video, increasing between calls
+            frame (numpy.ndarray): Decoded BGR frame
+
+        Returns:
+            bool: True if the frame should be kept
+        """
+        if not self.due(frame_index):
+            return False
+
+        signature = self.signature(frame)
+        keep = (self._last_signature is None
+                or (self.max_interval is not None and frame_index - self._last_index >= self.max_interval)
+                or self.difference(self._last_signature, signature) >= self.threshold)
+        if keep:
+            self._last_index = frame_index
+            self._last_signature = signature
+        return keep
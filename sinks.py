@@ -0,0 +1,388 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import re
+import tarfile
+import time
+from lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+IMAGE_FORMATS = ('jpg', 'png', 'webp')
+SINK_FORMATS = IMAGE_FORMATS + ('npy', 'tar')
+
+NPY_FRAMES_NAME = 'frames.npy'
+NPY_INDEX_NAME = 'frames_index.npy'
+DEFAULT_SHARD_SIZE = 1000
+DEFAULT_WRITE_THREADS = 2
+# Suffix of files being written; they are renamed to their final name once complete
+TEMP_SUFFIX = '.tmp'
+
+# Subdirectories ImageSink spreads frames over with subdir_size, see ImageSink.subdir_name
+SUBDIR_PATTERN = re.compile(r'^frames_\d{6,}$')
+
+# When written files are flushed to disk
+FSYNC_NONE = 'none' # leave it to the OS
+FSYNC_FILE = 'file' # fsync each file before renaming it, and its folder at the end
+FSYNC_END = 'end'   # one os.sync() when a segment finishes (Unix)
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_FILE, FSYNC_END)
+
+def frame_file_name(frame_count, extension='jpg'):
+    """Return the file name a frame is saved under"""
+    return f"frame_{frame_count:06d}.{extension}"
+
+def is_frame_subdir(name):
+    """Return True if a folder name is one of the frame subdirectories written by ImageSink"""
+    return SUBDIR_PATTERN.match(name) is not None
+
+def fsync_directory(path):
+    """Flush the entries of a folder to disk, where the platform allows opening folders"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_atomic(path, data, fsync=False):
+    """
+    Write data to a temporary name next to path, then rename it to path
+
+    A crash leaves either the complete file or a leftover temporary file, never a
+    truncated file under the final name.
+
+    Args:
+        path (str): Final path of the file
+        data (bytes): Content to write
+        fsync (bool): Flush the file to disk before renaming it (default: False)
+    """
+    temp_path = path + TEMP_SUFFIX
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+class FrameSink:
+    """
+    Destination for extracted frames
+
+    prepare() runs once in the extracting process before any frame is written.
+    Each segment of the extraction (possibly in its own worker process) then
+    calls open(), write() for its frames and close(). encode() may run
+    concurrently in several threads; write() always runs in one thread.
+    Sinks are pickled into worker processes, so they must not hold open
+    resources before open().
+
+    Writes may complete after write() returns. write() and close() return the
+    writes completed since the last call as (frame_count, path, nbytes, seconds)
+    tuples, in the order the frames were written, so callers only report frames
+    that are on disk.
+    """
+
+    def params(self):
+        """Return the settings that determine the written data, for resume manifests"""
+        return {'format': type(self).__name__}
+
+    def prepare(self, output_folder, frame_shape, frame_indices):
+        """
+        Args:
+            output_folder (str): Folder the frames are written to
+            frame_shape (tuple): Shape of a transformed frame
+            frame_indices (list): Every frame index the extraction may write, in order; empty when
+                they are only known while decoding (time-based sampling)
+        """
+
+    def open(self, output_folder):
+        self.output_folder = output_folder
+
+    def encode(self, frame):
+        """Return the payload written for a transformed frame"""
+        return frame
+
+    def write(self, frame_count, payload):
+        """
+        Write one frame's payload
+
+        Returns:
+            list: (frame_count, path, nbytes, seconds) of each write completed since the last call
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Finish the writes of the segment
+
+        Returns:
+            list: (frame_count, path, nbytes, seconds) of the writes completed since the last call
+        """
+        return []
+
+class ImageSink(FrameSink):
+    """
+    One image file per frame, as JPEG, PNG or WebP
+
+    Files are written by a pool of writer threads, so the extraction loop does
+    not wait for the disk, and each file is written under a temporary name and
+    renamed once complete. With subdir_size, files are spread over
+    subdirectories covering subdir_size frame indices each, keeping folders
+    small enough to list quickly.
+    """
+
+    def __init__(self, image_format='jpg', quality=None, compression=None, write_threads=DEFAULT_WRITE_THREADS,
+                 subdir_size=None, fsync=FSYNC_NONE):
+        """
+        Args:
+            image_format (str): One of IMAGE_FORMATS (default: jpg)
+            quality (int): JPEG quality (0-100) or WebP quality (1-100, above 100 for lossless);
+                None for the OpenCV default
+            compression (int): PNG compression level (0-9), None for the OpenCV default
+            write_threads (int): Writer threads, 0 to write synchronously (default: DEFAULT_WRITE_THREADS)
+            subdir_size (int): Frame indices per subdirectory, None to write every file in the
+                output folder itself (default: None)
+            fsync (str): One of FSYNC_POLICIES (default: none)
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Error: Image format must be one of: {', '.join(IMAGE_FORMATS)}")
+        if write_threads < 0 or (subdir_size is not None and subdir_size < 1):
+            raise ValueError("Error: Write threads must be at least 0 and subdirectory size at least 1")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Error: Fsync policy must be one of: {', '.join(FSYNC_POLICIES)}")
+        self.image_format = image_format
+        self.quality = quality
+        self.compression = compression
+        self.write_threads = write_threads
+        self.subdir_size = subdir_size
+        self.fsync = fsync
+        self._executor = None
+        self._pending = deque()
+        self._directories = set()
+
+        self.encode_params = []
+        if quality is not None and image_format == 'jpg':
+            self.encode_params += [cv2.IMWRITE_JPEG_QUALITY, quality]
+        if quality is not None and image_format == 'webp':
+            self.encode_params += [cv2.IMWRITE_WEBP_QUALITY, quality]
+        if compression is not None and image_format == 'png':
+            self.encode_params += [cv2.IMWRITE_PNG_COMPRESSION, compression]
+
+    def params(self):
+        return {'format': self.image_format, 'quality': self.quality, 'compression': self.compression,
+                'subdir_size': self.subdir_size}
+
+    def subdir_name(self, frame_count):
+        """Return the subdirectory holding a frame, '' without subdirectories"""
+        if self.subdir_size is None:
+            return ''
+        return f"frames_{frame_count // self.subdir_size * self.subdir_size:06d}"
+
+    def file_name(self, frame_count):
+        """Return the path of a frame relative to the output folder"""
+        return os.path.join(self.subdir_name(frame_count), frame_file_name(frame_count, self.image_format))
+
+    def prepare(self, output_folder, frame_shape, frame_indices):
+        # Created up front, so parallel segments never race to create them
+        for subdir in {self.subdir_name(frame_count) for frame_count in frame_indices} - {''}:
+            os.makedirs(os.path.join(output_folder, subdir), exist_ok=True)
+
+    def open(self, output_folder):
+        super().open(output_folder)
+        self._directories = set()
+        if self.write_threads > 0:
+            self._executor = ThreadPoolExecutor(max_workers=self.write_threads)
+
+    def encode(self, frame):
+        ret, buffer = cv2.imencode('.' + self.image_format, frame, self.encode_params)
+        if not ret:
+            raise ValueError("Error: Could not encode frame")
+        return buffer.tobytes()
+
+    def _write_file(self, frame_count, payload):
+        start = time.perf_counter()
+        output_path = os.path.join(self.output_folder, self.file_name(frame_count))
+        write_atomic(output_path, payload, self.fsync == FSYNC_FILE)
+        return frame_count, output_path, len(payload), time.perf_counter() - start
+
+    def write(self, frame_count, payload):
+        subdir = self.subdir_name(frame_count)
+        if subdir not in self._directories:
+            # Frames prepare() was not told about, e.g. with time-based sampling, get their folder here
+            os.makedirs(os.path.join(self.output_folder, subdir), exist_ok=True)
+            self._directories.add(subdir)
+        if self._executor is None:
+            return [self._write_file(frame_count, payload)]
+
+        self._pending.append(self._executor.submit(self._write_file, frame_count, payload))
+        # Bound the encoded frames held in memory; collect finished writes in order
+        completed = []
+        while self._pending and (self._pending[0].done() or len(self._pending) > 2 * self.write_threads):
+            completed.append(self._pending.popleft().result())
+        return completed
+
+    def close(self):
+        try:
+            completed = []
+            while self._pending:
+                completed.append(self._pending.popleft().result())
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+            self._pending.clear()
+
+        if self.fsync == FSYNC_FILE:
+            for subdir in self._directories:
+                fsync_directory(os.path.join(self.output_folder, subdir))
+        elif self.fsync == FSYNC_END and hasattr(os, 'sync'):
+            os.sync()
+        return completed
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_pending'] = deque()
+        return state
+
+class NpySink(FrameSink):
+    """
+    All frames in one memory-mapped (N, height, width, channels) .npy array
+
+    frames_index.npy holds the video frame index of each row, -1 for rows that
+    were never written (e.g. when the video ends before its reported length).
+    Workers write disjoint rows of the same files, so parallel segments need no
+    merging.
+    """
+
+    def __init__(self):
+        self._frames = None
+        self._index = None
+        self._start_frame = 0
+        self._frame_interval = 1
+
+    def params(self):
+        return {'format': 'npy'}
+
+    def prepare(self, output_folder, frame_shape, frame_indices):
+        frames_path = os.path.join(output_folder, NPY_FRAMES_NAME)
+        index_path = os.path.join(output_folder, NPY_INDEX_NAME)
+
+        frames = np.lib.format.open_memmap(frames_path, mode='w+', dtype=np.uint8,
+                                           shape=(len(frame_indices),) + tuple(frame_shape))
+        del frames
+        index = np.lib.format.open_memmap(index_path, mode='w+', dtype=np.int64, shape=(len(frame_indices),))
+        index[:] = -1
+        index.flush()
+        del index
+
+        self._start_frame = frame_indices[0] if frame_indices else 0
+        self._frame_interval = frame_indices[1] - frame_indices[0] if len(frame_indices) > 1 else 1
+
+    def open(self, output_folder):
+        super().open(output_folder)
+        self.frames_path = os.path.join(output_folder, NPY_FRAMES_NAME)
+        self._frames = np.load(self.frames_path, mmap_mode='r+')
+        self._index = np.load(os.path.join(output_folder, NPY_INDEX_NAME), mmap_mode='r+')
+
+    def write(self, frame_count, payload):
+        start = time.perf_counter()
+        row = (frame_count - self._start_frame) // self._frame_interval
+        self._frames[row] = payload
+        self._index[row] = frame_count
+        return [(frame_count, self.frames_path, payload.nbytes, time.perf_counter() - start)]
+
+    def close(self):
+        for array in (self._frames, self._index):
+            if array is not None:
+                array.flush()
+        self._frames = None
+        self._index = None
+        return []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_frames'] = None
+        state['_index'] = None
+        return state
+
+class TarShardSink(FrameSink):
+    """
+    Encoded frames packed into uncompressed tar shards of shard_size frames
+
+    Each segment starts its own shards, named after their first frame index.
+    A shard is written under a temporary name and renamed once it is complete.
+    """
+
+    def __init__(self, shard_size=DEFAULT_SHARD_SIZE, image_sink=None):
+        """
+        Args:
+            shard_size (int): Frames per shard (default: DEFAULT_SHARD_SIZE)
+            image_sink (ImageSink): Encoder of the frames in the shards (default: JPEG)
+        """
+        if shard_size < 1:
+            raise ValueError("Error: Shard size must be at least 1")
+        self.shard_size = shard_size
+        self.image_sink = image_sink or ImageSink()
+        self._tar = None
+        self._shard_frames = 0
+
+    def params(self):
+        return {'format': 'tar', 'shard_size': self.shard_size, 'image': self.image_sink.params()}
+
+    def encode(self, frame):
+        return self.image_sink.encode(frame)
+
+    def write(self, frame_count, payload):
+        start = time.perf_counter()
+        if self._tar is None or self._shard_frames == self.shard_size:
+            self.close()
+            self.shard_path = os.path.join(self.output_folder, f"shard_{frame_count:06d}.tar")
+            self._tar = tarfile.open(self.shard_path + TEMP_SUFFIX, 'w')
+            self._shard_frames = 0
+
+        info = tarfile.TarInfo(frame_file_name(frame_count, self.image_sink.image_format))
+        info.size = len(payload)
+        self._tar.addfile(info, io.BytesIO(payload))
+        self._shard_frames += 1
+        return [(frame_count, self.shard_path, len(payload), time.perf_counter() - start)]
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+            os.replace(self.shard_path + TEMP_SUFFIX, self.shard_path)
+        return []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_tar'] = None
+        return state
+
+def make_sink(output_format='jpg', quality=None, compression=None, shard_size=DEFAULT_SHARD_SIZE,
+              shard_format='jpg', write_threads=DEFAULT_WRITE_THREADS, subdir_size=None, fsync=FSYNC_NONE):
+    """
+    Create the sink for an output format
+
+    Args:
+        output_format (str): One of SINK_FORMATS (default: jpg)
+        quality (int): JPEG/WebP quality of image files and tar shard members
+        compression (int): PNG compression level of image files and tar shard members
+        shard_size (int): Frames per tar shard (default: DEFAULT_SHARD_SIZE)
+        shard_format (str): Image format inside tar shards, one of IMAGE_FORMATS (default: jpg)
+        write_threads (int): Writer threads of image file output, 0 to write synchronously
+        subdir_size (int): Frame indices per subdirectory of image file output, None for one folder
+        fsync (str): When image files are flushed to disk, one of FSYNC_POLICIES (default: none)
+
+    Returns:
+        FrameSink: The sink
+    """
+    if output_format in IMAGE_FORMATS:
+        return ImageSink(output_format, quality, compression, write_threads, subdir_size, fsync)
+    if output_format == 'npy':
+        return NpySink()
+    if output_format == 'tar':
+        return TarShardSink(shard_size, ImageSink(shard_format, quality, compression))
+    raise ValueError(f"Error: Output format must be one of: {', '.join(SINK_FORMATS)}")
@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+
+STAGES = ('decode', 'transform', 'encode', 'write')
+# Upper bounds in ms of the latency histogram buckets; the last bucket is unbounded
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+DEFAULT_METRICS_INTERVAL = 1.0
+
+class StageTimer:
+    """
+    Cumulative time and latency histogram of one stage
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def percentile(self, percent):
+        """Return the upper bound in ms of the bucket holding a percentile, capped at the max; None without samples"""
+        if self.count == 0:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return min(bound, round(self.max * 1000, 4))
+        return round(self.max * 1000, 4)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 4),
+            'mean_ms': round(self.total / self.count * 1000, 4) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max * 1000, 4),
+            'histogram': dict(zip([f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + ['>1000ms'], self.histogram)),
+        }
+
+class ExtractionStats:
+    """
+    Where an extraction spends its time
+
+    Holds per-stage timings (decode, transform, encode, write), frames grabbed,
+    decoded and kept, bytes written and, when stages run in a pipeline, the
+    depths of its queues. Stages may be timed from several threads at once.
+    Decode time is the time spent obtaining each kept frame, including grabbing
+    the skipped frames before it.
+    """
+
+    def __init__(self):
+        self.stages = {stage: StageTimer() for stage in STAGES}
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.frames_kept = 0
+        self.bytes_written = 0
+        self.queue_depths = {}
+        self.elapsed = 0.0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def fps(self):
+        """Frames kept per second"""
+        return self.frames_kept / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage].add(seconds)
+
+    def add_write(self, seconds, nbytes):
+        """Record a kept frame written in seconds"""
+        with self._lock:
+            self.stages['write'].add(seconds)
+            self.frames_kept += 1
+            self.bytes_written += nbytes
+
+    def count_frame(self, decoded):
+        """Record a frame the capture advanced over, decoded to an image or only grabbed"""
+        with self._lock:
+            self.frames_grabbed += 1
+            if decoded:
+                self.frames_decoded += 1
+
+    def sample_queue(self, name, depth):
+        """Record the current depth of a pipeline queue"""
+        with self._lock:
+            samples, total, peak = self.queue_depths.get(name, (0, 0, 0))
+            self.queue_depths[name] = (samples + 1, total + depth, max(peak, depth))
+
+    def merge(self, other):
+        """Add the counts and timings of another ExtractionStats, e.g. of a worker process"""
+        with self._lock:
+            for stage, timer in other.stages.items():
+                self.stages[stage].merge(timer)
+            self.frames_grabbed += other.frames_grabbed
+            self.frames_decoded += other.frames_decoded
+            self.frames_kept += other.frames_kept
+            self.bytes_written += other.bytes_written
+            for name, (samples, total, peak) in other.queue_depths.items():
+                own_samples, own_total, own_peak = self.queue_depths.get(name, (0, 0, 0))
+                self.queue_depths[name] = (own_samples + samples, own_total + total, max(own_peak, peak))
+
+    def finish(self):
+        """Stop the clock of the extraction"""
+        self.elapsed = time.perf_counter() - self._start
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'elapsed_s': round(self.elapsed or time.perf_counter() - self._start, 4),
+                'frames_grabbed': self.frames_grabbed,
+                'frames_decoded': self.frames_decoded,
+                'frames_kept': self.frames_kept,
+                'bytes_written': self.bytes_written,
+                'stages': {stage: timer.to_dict() for stage, timer in self.stages.items()},
+                'queue_depths': {name: {'mean': round(total / samples, 2), 'max': peak}
+                                 for name, (samples, total, peak) in self.queue_depths.items()},
+            }
+
+    def stage_summary(self):
+        """Return a one-line share of the total stage time taken by each stage"""
+        with self._lock:
+            total = sum(timer.total for timer in self.stages.values())
+            if total <= 0:
+                return ""
+            return " | ".join(f"{stage} {timer.total / total * 100:.0f}%" for stage, timer in self.stages.items())
+
+    def __str__(self):
+        with self._lock:
+            return self._format()
+
+    def _format(self):
+        elapsed = self.elapsed or time.perf_counter() - self._start
+        lines = [f"Frames: {self.frames_grabbed} grabbed, {self.frames_decoded} decoded, {self.frames_kept} kept; "
+                 f"{self.bytes_written / (1024 * 1024):.1f} MB written in {elapsed:.2f} seconds"]
+        for stage, timer in self.stages.items():
+            if timer.count:
+                lines.append(f"  {stage:<9} {timer.total:8.2f} s total, {timer.total / timer.count * 1000:7.2f} ms mean, "
+                             f"p50 <= {timer.percentile(50):.2f} ms, p99 <= {timer.percentile(99):.2f} ms")
+        for name, (samples, total, peak) in self.queue_depths.items():
+            lines.append(f"  {name} queue: {total / samples:.1f} mean depth, {peak} max")
+        return "\n".join(lines)
+
+def timed_iter(items, stats, stage):
+    """Yield from items, adding the time spent producing each item to a stage of stats"""
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        stats.add(stage, time.perf_counter() - start)
+        yield item
@@ -0,0 +1,149 @@
+import time
+from lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+# Resize filters by name, as the names of their cv2 flags so that listing them does not load OpenCV
+INTERPOLATIONS = {
+    'nearest': 'INTER_NEAREST',
+    'linear': 'INTER_LINEAR',
+    'cubic': 'INTER_CUBIC',
+    'area': 'INTER_AREA',
+    'lanczos': 'INTER_LANCZOS4',
+}
+
+class FrameTransform:
+    """
+    Crop and resize images to a fixed geometry
+
+    Frames can be transformed one at a time or in batches. Batches are written
+    into one preallocated (batch_size, height, width, channels) buffer that is
+    reused for every batch, so the transform loop does not allocate per frame.
+    """
+
+    def __init__(self, crop_box=None, output_size=None, interpolation=None, batch_size=16):
+        """
+        Args:
+            crop_box (tuple): Crop rectangle as a (left, upper, right, lower)-tuple, None to keep the whole image
+            output_size (tuple): Output size as (width, height), None to keep the cropped size
+            interpolation (str or int): Name from INTERPOLATIONS or a cv2.INTER_* flag. None picks
+                'area' when the output is smaller than the crop in both dimensions and 'cubic' otherwise
+            batch_size (int): Number of frames held by the batch buffer (default: 16)
+        """
+        if crop_box is not None:
+            left, upper, right, lower = crop_box
+            if left < 0 or upper < 0 or right <= left or lower <= upper:
+                raise ValueError(f"Invalid crop box: {crop_box}")
+        if output_size is not None and (output_size[0] < 1 or output_size[1] < 1):
+            raise ValueError(f"Invalid output size: {output_size}")
+        if isinstance(interpolation, str):
+            if interpolation not in INTERPOLATIONS:
+                raise ValueError(f"Interpolation must be one of: {', '.join(INTERPOLATIONS)}")
+            interpolation = getattr(cv2, INTERPOLATIONS[interpolation])
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        self.crop_box = tuple(crop_box) if crop_box is not None else None
+        self.output_size = tuple(output_size) if output_size is not None else None
+        self.interpolation = interpolation
+        self.batch_size = batch_size
+        self._buffer = None
+
+    def crop_size(self, image_shape):
+        """Return the (width, height) of the crop for an image of the given shape"""
+        height, width = image_shape[:2]
+        if self.crop_box is None:
+            return width, height
+
+        left, upper, right, lower = self.crop_box
+        if right > width or lower > height:
+            raise ValueError(f"Crop box {self.crop_box} exceeds image size {width}x{height}")
+        return right - left, lower - upper
+
+    def output_shape(self, image_shape):
+        """Return the shape of the transformed image for an input of the given shape"""
+        width, height = self.output_size or self.crop_size(image_shape)
+        return (height, width) + tuple(image_shape[2:])
+
+    def resolve_interpolation(self, image_shape):
+        """Return the cv2 interpolation flag used for an input of the given shape"""
+        if self.interpolation is not None:
+            return self.interpolation
+
+        crop_width, crop_height = self.crop_size(image_shape)
+        out_width, out_height = self.output_size or (crop_width, crop_height)
+        # INTER_AREA is both faster and alias-free when shrinking in both dimensions
+        if out_width <= crop_width and out_height <= crop_height:
+            return cv2.INTER_AREA
+        return cv2.INTER_CUBIC
+
+    def crop(self, image):
+        """Return the crop of an image as a view, without copying"""
+        self.crop_size(image.shape)
+        if self.crop_box is None:
+            return image
+        left, upper, right, lower = self.crop_box
+        return image[upper:lower, left:right]
+
+    def apply(self, image, out=None):
+        """
+        Crop and resize a single image
+
+        Args:
+            image (numpy.ndarray): Input image
+            out (numpy.ndarray): Optional preallocated array of output_shape(image.shape) to write into
+
+        Returns:
+            numpy.ndarray: Transformed image (out, when given)
+        """
+        cropped = self.crop(image)
+        if self.output_size is None or self.output_size == (cropped.shape[1], cropped.shape[0]):
+            if out is None:
+                return cropped
+            out[...] = cropped
+            return out
+
+        return cv2.resize(cropped, self.output_size, dst=out, interpolation=self.resolve_interpolation(image.shape))
+
+    def batch_buffer(self, image_shape, dtype=None):
+        """Return the reusable (uint8 by default) batch buffer for inputs of the given shape, allocating it on first use"""
+        dtype = dtype or np.uint8
+        shape = (self.batch_size,) + self.output_shape(image_shape)
+        if self._buffer is None or self._buffer.shape != shape or self._buffer.dtype != dtype:
+            self._buffer = np.empty(shape, dtype=dtype)
+        return self._buffer
+
+    def iter_batches(self, items, timer=None):
+        """
+        Transform (key, image) pairs in batches held in the reusable buffer
+
+        The yielded batch is a view of the buffer and is overwritten by the
+        next batch; copy it to keep it.
+
+        Args:
+            items (iterable): (key, image) pairs with images of one shape
+            timer (callable): Optional timer(seconds) called with the time each image took to transform
+
+        Yields:
+            tuple: (keys, batch) with batch of shape (len(keys),) + output shape
+        """
+        keys = []
+        buffer = None
+        for key, image in items:
+            if buffer is None:
+                buffer = self.batch_buffer(image.shape, image.dtype)
+            if timer is None:
+                self.apply(image, out=buffer[len(keys)])
+            else:
+                start = time.perf_counter()
+                self.apply(image, out=buffer[len(keys)])
+                timer(time.perf_counter() - start)
+            keys.append(key)
+
+            if len(keys) == self.batch_size:
+                yield keys, buffer
+                keys = []
+
+        if keys:
+            yield keys, buffer[:len(keys)]
@@ -0,0 +1,215 @@
+import bisect
+import os
+import threading
+import cv2
+import numpy as np
+from manifest import video_identity
+
+THUMBNAIL_SIZE = (160, 90) # (width, height)
+THUMBNAIL_COUNT = 200
+INDEX_SUFFIX = '.index.npz'
+# Bumped when the contents of the index change, so stale sidecar files are rebuilt
+INDEX_VERSION = 2
+# Timestamps closer than this count as the same frame
+TIMESTAMP_TOLERANCE_MS = 1e-3
+
+class VideoIndex:
+    """
+    Keyframe positions, frame timestamps and a strip of low-res thumbnails of a video
+    """
+
+    def __init__(self, keyframes, timestamps, thumbnail_indices, thumbnails):
+        """
+        Args:
+            keyframes (numpy.ndarray): Sorted indices of the keyframes, empty if unknown
+            timestamps (numpy.ndarray): Presentation timestamp of every frame in ms
+            thumbnail_indices (numpy.ndarray): Sorted frame index of each thumbnail
+            thumbnails (numpy.ndarray): RGB thumbnails of shape (N, height, width, 3)
+        """
+        self.keyframes = keyframes
+        self.timestamps = timestamps
+        self.thumbnail_indices = thumbnail_indices
+        self.thumbnails = thumbnails
+
+    def keyframe_before(self, index):
+        """Return the index of the last keyframe at or before index, or None if unknown"""
+        position = bisect.bisect_right(self.keyframes, index)
+        if position == 0:
+            return None
+        return int(self.keyframes[position - 1])
+
+    def thumbnail_near(self, index):
+        """Return the thumbnail closest to frame index, or None if there are none"""
+        if len(self.thumbnails) == 0:
+            return None
+        position = bisect.bisect_left(self.thumbnail_indices, index)
+        if position == len(self.thumbnail_indices) or (
+                position > 0 and index - self.thumbnail_indices[position - 1] < self.thumbnail_indices[position] - index):
+            position -= 1
+        return self.thumbnails[position]
+
+    def save(self, path, video_hash):
+        """Write the index to path, tagged with the hash of the video it describes"""
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, version=INDEX_VERSION, video_hash=video_hash, keyframes=self.keyframes, timestamps=self.timestamps,
+                 thumbnail_indices=self.thumbnail_indices, thumbnails=self.thumbnails)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, video_hash):
+        """Read an index from path, returning None if it is missing, outdated or describes another video"""
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != INDEX_VERSION or str(data['video_hash']) != video_hash:
+                    return None
+                return cls(data['keyframes'], data['timestamps'], data['thumbnail_indices'], data['thumbnails'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+def index_path(video_path):
+    """Return the path of the sidecar index file of a video"""
+    return video_path + INDEX_SUFFIX
+
+def scan_packets(video_path, stop=None):
+    """
+    Read the keyframe positions and frame timestamps of a video from its packets, without decoding
+
+    The capture is switched to raw packets (CAP_PROP_FORMAT -1), where the key
+    frame flag describes the packet just grabbed; on a decoding capture it
+    describes the last packet the demuxer read, which runs ahead of the frame
+    with B-frames. Packets arrive in decoding order, so they are put in display
+    order by timestamp. Where raw packets are unsupported, every frame is
+    decoded and the keyframes are left unknown.
+
+    Args:
+        video_path (str): Path to the video file
+        stop (threading.Event): Optional event that aborts the scan when set
+
+    Returns:
+        tuple: (keyframes, timestamps) lists of frame indices and ms in display order,
+            or None if the scan was aborted
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Error: Could not open video file")
+
+    raw = cap.set(cv2.CAP_PROP_FORMAT, -1)
+    packets = []
+    try:
+        while cap.grab():
+            if stop is not None and stop.is_set():
+                return None
+            packets.append((cap.get(cv2.CAP_PROP_POS_MSEC), raw and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0))
+    finally:
+        cap.release()
+
+    packets.sort(key=lambda packet: packet[0])
+    keyframes = [index for index, (_, is_key) in enumerate(packets) if is_key]
+    timestamps = [timestamp for timestamp, _ in packets]
+    return keyframes, timestamps
+
+def build_video_index(video_path, stop=None):
+    """
+    Build the index of a video from a packet scan, then decode the thumbnails
+
+    Thumbnails are taken at keyframes spread over the video when the keyframes
+    are known, so each one costs a seek and the decode of a single frame. Each
+    seek is checked against the scanned timestamps: OpenCV seeks by the nominal
+    frame rate, so in variable frame rate video it can land early, which is
+    fixed by grabbing forward, or late, after which the remaining thumbnails
+    are reached by grabbing forward from the start instead of seeking.
+
+    Args:
+        video_path (str): Path to the video file
+        stop (threading.Event): Optional event that aborts the build when set
+
+    Returns:
+        VideoIndex: The index, or None if the build was aborted
+    """
+    scan = scan_packets(video_path, stop)
+    if scan is None:
+        return None
+    keyframes, timestamps = scan
+    keyframes = np.array(keyframes, dtype=np.int64)
+    timestamps = np.array(timestamps, dtype=np.float64)
+
+    candidates = np.linspace(0, len(timestamps) - 1, min(THUMBNAIL_COUNT, len(timestamps))).astype(np.int64)
+    if len(keyframes):
+        candidates = keyframes[np.maximum(np.searchsorted(keyframes, candidates, side='right') - 1, 0)]
+
+    thumbnail_indices = []
+    thumbnails = []
+    cap = cv2.VideoCapture(video_path)
+    sequential = False
+    next_index = 0
+    try:
+        for index in np.unique(candidates):
+            if stop is not None and stop.is_set():
+                return None
+
+            target = timestamps[index]
+            if not sequential:
+                cap.set(cv2.CAP_PROP_POS_MSEC, target)
+                found = cap.grab()
+                while found and cap.get(cv2.CAP_PROP_POS_MSEC) < target - TIMESTAMP_TOLERANCE_MS:
+                    found = cap.grab()
+                if not found or cap.get(cv2.CAP_PROP_POS_MSEC) > target + TIMESTAMP_TOLERANCE_MS:
+                    sequential = True
+                    cap.release()
+                    cap = cv2.VideoCapture(video_path)
+            if sequential:
+                found = True
+                while found and next_index <= index:
+                    found = cap.grab()
+                    next_index += 1
+
+            ret, frame = cap.retrieve() if found else (False, None)
+            if ret:
+                frame = cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+                thumbnails.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                thumbnail_indices.append(int(index))
+    finally:
+        cap.release()
+
+    width, height = THUMBNAIL_SIZE
+    return VideoIndex(
+        keyframes,
+        timestamps,
+        np.array(thumbnail_indices, dtype=np.int64),
+        np.array(thumbnails, dtype=np.uint8).reshape(-1, height, width, 3),
+    )
+
+class VideoIndexer:
+    """
+    Background thread loading a video's sidecar index, or building and saving it on first use
+
+    The index attribute is None until the index is ready.
+    """
+
+    def __init__(self, video_path):
+        self.video_path = video_path
+        self.index = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        identity = video_identity(self.video_path)
+        video_hash = f"{identity['size']}:{identity['hash']}"
+        path = index_path(self.video_path)
+
+        index = VideoIndex.load(path, video_hash)
+        if index is None:
+            index = build_video_index(self.video_path, self._stop)
+            if index is None:
+                return
+            try:
+                index.save(path, video_hash)
+            except OSError as e:
+                print(f"Could not save video index {path}: {e}")
+        self.index = index
@@ -5,6 +5,19 @@ from PIL import Image, ImageTk
 import os
 import threading
 from extract_frames import extract_frames
+from frame_cache import FrameCache, FrameReadAhead
+from playback import PlaybackEngine
+from progress import ProgressChannel
+from video_index import VideoIndexer, THUMBNAIL_SIZE
+
+DISPLAY_SIZE = (960, 540)
+# How often the Tk loop drains extraction progress
+PROGRESS_POLL_MS = 100
+
+def prepare_display_frame(frame):
+    """Convert a decoded BGR frame to an RGB frame at display size"""
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return cv2.resize(frame, DISPLAY_SIZE)
 
 class VideoPlayer:
     def __init__(self, root):
@@ -15,6 +28,13 @@ class VideoPlayer:
         # Video variables
         self.video_path = None
         self.cap = None
+        self.frame_cache = FrameCache()
+        self.read_ahead = None
+        self.playback = None
+        self.indexer = None
+        self.play_job = None
+        self.progress_channel = None
+        self.position = 0  # index of the next frame, like CAP_PROP_POS_FRAMES
         self.current_frame = None
         self.is_playing = False
         self.total_frames = 0
@@ -66,6 +86,14 @@ class VideoPlayer:
         self.canvas = tk.Canvas(left_panel, width=960, height=540, bg='black')
         self.canvas.grid(row=1, column=0, pady=(0, 5))
         
+        # One image item whose pixels are replaced on every frame
+        self.current_frame = ImageTk.PhotoImage('RGB', DISPLAY_SIZE)
+        self.image_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.current_frame, state=tk.HIDDEN)
+        
+        # Thumbnail shown above the slider while it is dragged
+        self.preview_frame = ImageTk.PhotoImage('RGB', THUMBNAIL_SIZE)
+        self.preview_item = self.canvas.create_image(0, 540, anchor=tk.SW, image=self.preview_frame, state=tk.HIDDEN)
+        
         # Time display and slider (in left panel)
         time_frame = ttk.Frame(left_panel)
         time_frame.grid(row=2, column=0, sticky="ew", pady=(0, 5))
@@ -77,6 +105,7 @@ class VideoPlayer:
         self.time_slider = ttk.Scale(time_frame, from_=0, to=100, orient=tk.HORIZONTAL)
         self.time_slider.pack(fill=tk.X, pady=(5, 0))
         self.time_slider.bind("<ButtonRelease-1>", self.slider_changed)
+        self.time_slider.bind("<B1-Motion>", self.slider_dragged)
         
         # Playback controls (in left panel)
         controls_frame = ttk.Frame(left_panel)
@@ -129,7 +158,21 @@ class VideoPlayer:
         self.interval_var = tk.StringVar(value="60")
         ttk.Entry(settings_frame, textvariable=self.interval_var).grid(row=1, column=1, padx=5, pady=5, sticky="ew")
         
-        ttk.Button(settings_frame, text="Extract Frames", command=self.extract_frames).grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Label(settings_frame, text="Workers:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.workers_var = tk.StringVar(value="1")
+        ttk.Entry(settings_frame, textvariable=self.workers_var).grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+        
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Resume previous extraction", variable=self.resume_var).grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+        
+        ttk.Button(settings_frame, text="Extract Frames", command=self.extract_frames).grid(row=4, column=0, columnspan=2, pady=10)
+        
+        self.progress_bar = ttk.Progressbar(settings_frame, maximum=100)
+        self.progress_bar.grid(row=5, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="ew")
+        self.progress_label = ttk.Label(settings_frame, text="")
+        self.progress_label.grid(row=6, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="w")
+        self.stats_label = ttk.Label(settings_frame, text="")
+        self.stats_label.grid(row=7, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="w")
         
         # Output display (in right panel)
         output_frame = ttk.LabelFrame(right_panel, text="Output Log")
@@ -151,7 +194,31 @@ class VideoPlayer:
     def update_output(self, message):
         self.output_text.insert(tk.END, message + "\n")
         self.output_text.see(tk.END)
-        self.root.update_idletasks()
+
+    def poll_progress(self):
+        """Drain the extraction progress channel and update the log and progress display"""
+        items = self.progress_channel.drain()
+        messages = [payload for kind, payload in items if kind == 'message']
+        if messages:
+            self.update_output("\n".join(messages))
+        
+        events = [payload for kind, payload in items if kind == 'progress']
+        if events:
+            self.progress_bar['value'] = events[-1].percent
+            self.progress_label.config(text=str(events[-1]))
+        
+        stage_summaries = [payload for kind, payload in items if kind == 'stats']
+        if stage_summaries:
+            self.stats_label.config(text=stage_summaries[-1])
+        
+        for kind, payload in items:
+            if kind == 'done':
+                messagebox.showinfo("Success", "Frame extraction completed!")
+                return
+            if kind == 'error':
+                messagebox.showerror("Error", f"Failed to extract frames: {payload}")
+                return
+        self.root.after(PROGRESS_POLL_MS, self.poll_progress)
 
     def select_file(self):
         file_path = filedialog.askopenfilename(filetypes=[
@@ -159,96 +226,194 @@ class VideoPlayer:
             ("All files", "*.*")
         ])
         if file_path:
-            self.video_path = file_path
-            self.file_label.config(text=os.path.basename(file_path))
-            self.load_video()
-            self.update_controls_state()
+            self.open_video(file_path)
+
+    def open_video(self, file_path):
+        self.video_path = file_path
+        self.file_label.config(text=os.path.basename(file_path))
+        self.load_video()
+        self.update_controls_state()
 
     def load_video(self):
+        self.pause()
         if self.cap is not None:
             self.cap.release()
+        if self.read_ahead is not None:
+            self.read_ahead.stop()
+        if self.playback is not None:
+            self.playback.release()
+        if self.indexer is not None:
+            self.indexer.stop()
         
         self.cap = cv2.VideoCapture(self.video_path)
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.position = 0
         self.time_slider.config(to=self.total_frames)
+        
+        self.frame_cache.clear()
+        self.read_ahead = FrameReadAhead(self.video_path, self.frame_cache, prepare_display_frame)
+        self.read_ahead.start()
+        self.playback = PlaybackEngine(self.video_path, prepare_display_frame)
+        self.indexer = VideoIndexer(self.video_path)
+        self.indexer.start()
         self.update_frame()
 
+    def read_display_frame(self, index):
+        """Return the display frame at index from the cache, decoding it on a miss"""
+        frame = self.frame_cache.get(index)
+        if frame is None:
+            self.seek_capture(index)
+            ret, frame = self.cap.read()
+            if not ret:
+                return None
+            frame = prepare_display_frame(frame)
+            self.frame_cache.put(index, frame)
+        return frame
+
+    def seek_capture(self, index):
+        """Position self.cap to read frame index, grabbing forward instead of seeking when the index shows it is cheaper"""
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if position == index:
+            return
+        
+        keyframe = self.indexer.index.keyframe_before(index) if self.indexer.index is not None else None
+        # A seek decodes forward from the keyframe before index; when the capture already
+        # sits between that keyframe and index, grabbing forward decodes fewer frames
+        if keyframe is not None and keyframe <= position < index:
+            for _ in range(index - position):
+                if not self.cap.grab():
+                    break
+            return
+        
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+
+    def display(self, index, frame):
+        """Paste a display frame into the canvas image and update the time display"""
+        self.current_frame.paste(Image.fromarray(frame))
+        self.canvas.itemconfig(self.image_item, state=tk.NORMAL)
+        self.position = index + 1
+        
+        current_time = self.position / self.fps
+        total_time = self.total_frames / self.fps
+        self.time_label.config(text=f"{self.format_time(current_time)} / {self.format_time(total_time)}")
+        self.time_slider.set(self.position)
+
     def update_frame(self):
+        """Show the frame at the current position and move the read-ahead window around it"""
         if self.cap is None:
             return
         
-        ret, frame = self.cap.read()
-        if ret:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame = cv2.resize(frame, (960, 540))
-            self.current_frame = ImageTk.PhotoImage(Image.fromarray(frame))
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=self.current_frame)
-            
-            current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-            current_time = current_frame / self.fps
-            total_time = self.total_frames / self.fps
-            
-            self.time_label.config(text=f"{self.format_time(current_time)} / {self.format_time(total_time)}")
-            self.time_slider.set(current_frame)
-            
-            if self.is_playing:
-                self.root.after(int(1000/self.fps), self.update_frame)
+        index = max(0, int(self.position))
+        if index >= self.total_frames:
+            return
+        self.read_ahead.set_playhead(index)
+        frame = self.read_display_frame(index)
+        if frame is not None:
+            self.display(index, frame)
+
+    def play_tick(self):
+        """Present the frame due on the playback clock and schedule the next one"""
+        self.play_job = None
+        if not self.is_playing:
+            return
+        
+        item = self.playback.take(self.playback.clock_index())
+        if item is not None:
+            self.display(*item)
+        elif self.playback.finished:
+            self.pause()
+            return
+        
+        self.play_job = self.root.after(self.playback.next_frame_delay(), self.play_tick)
+
+    def play(self):
+        self.is_playing = True
+        self.play_button.config(text="⏸")
+        self.playback.start(self.position)
+        self.play_tick()
+
+    def pause(self):
+        if not self.is_playing:
+            return
+        self.is_playing = False
+        self.play_button.config(text="▶")
+        if self.play_job is not None:
+            self.root.after_cancel(self.play_job)
+            self.play_job = None
+        self.playback.stop()
+        self.read_ahead.set_playhead(self.position)
 
     def toggle_play(self):
         if self.cap is None:
             return
         
-        self.is_playing = not self.is_playing
-        self.play_button.config(text="⏸" if self.is_playing else "▶")
         if self.is_playing:
+            self.pause()
+        else:
+            self.play()
+
+    def seek(self, index):
+        """Move to frame index, restarting playback there if playing"""
+        self.position = index
+        if self.is_playing:
+            self.playback.start(self.position)
+        else:
             self.update_frame()
 
     def skip_time(self, seconds):
         if self.cap is None:
             return
         
-        current_frame = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
-        new_frame = current_frame + (seconds * self.fps)
-        new_frame = max(0, min(new_frame, self.total_frames))
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, new_frame)
-        self.update_frame()
+        new_frame = self.position + (seconds * self.fps)
+        self.seek(max(0, min(int(new_frame), self.total_frames)))
 
     def prev_frame(self):
         if self.cap is None:
             return
         
-        current_frame = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, current_frame - 2))
-        self.update_frame()
+        self.seek(max(0, self.position - 2))
 
     def next_frame(self):
         if self.cap is None:
             return
-        self.update_frame()
+        self.seek(self.position)
+
+    def slider_dragged(self, event):
+        """Preview the thumbnail nearest to the slider position while dragging"""
+        if self.cap is None or self.indexer.index is None:
+            return
+        
+        frame_no = int(self.time_slider.get())
+        thumbnail = self.indexer.index.thumbnail_near(frame_no)
+        if thumbnail is None:
+            return
+        
+        self.preview_frame.paste(Image.fromarray(thumbnail))
+        fraction = frame_no / max(1, self.total_frames)
+        x = int(fraction * (DISPLAY_SIZE[0] - THUMBNAIL_SIZE[0]))
+        self.canvas.coords(self.preview_item, x, DISPLAY_SIZE[1])
+        self.canvas.itemconfig(self.preview_item, state=tk.NORMAL)
 
     def slider_changed(self, event):
         if self.cap is None:
             return
         
-        frame_no = self.time_slider.get()
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
-        self.update_frame()
+        self.canvas.itemconfig(self.preview_item, state=tk.HIDDEN)
+        self.seek(int(self.time_slider.get()))
 
     def capture_start(self):
         if self.cap is None:
             return
         
-        current_frame = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
-        self.start_time = current_frame / self.fps
+        self.start_time = self.position / self.fps
         self.start_label.config(text=self.format_time(self.start_time))
 
     def capture_end(self):
         if self.cap is None:
             return
         
-        current_frame = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
-        self.end_time = current_frame / self.fps
+        self.end_time = self.position / self.fps
         self.end_label.config(text=self.format_time(self.end_time))
 
     def format_time(self, seconds):
@@ -261,28 +426,55 @@ class VideoPlayer:
             messagebox.showerror("Error", "Please select video, capture start/end times, and set output folder")
             return
         
+        # Tk variables may only be read on the Tk thread, so read and check them before starting the worker
+        video_path = self.video_path
+        output_folder = self.folder_var.get()
+        incremental = self.resume_var.get()
+        try:
+            interval = int(self.interval_var.get())
+            workers = int(self.workers_var.get())
+        except (ValueError, tk.TclError):
+            messagebox.showerror("Error", "Frame interval and workers must be whole numbers")
+            return
+        if interval < 1 or workers < 1:
+            messagebox.showerror("Error", "Frame interval and workers must be at least 1")
+            return
+        start_time = self.format_time(self.start_time)
+        end_time = self.format_time(self.end_time)
+        
+        # The worker only posts to the channel; all widget updates happen in poll_progress
+        channel = ProgressChannel()
+        
         def run_extraction():
             try:
-                self.output_text.delete(1.0, tk.END)
-                self.update_output("Starting frame extraction...")
-                
-                # Run extraction with progress callback
-                extract_frames(
-                    self.video_path,
-                    self.folder_var.get(),
-                    int(self.interval_var.get()),
-                    start_time=self.format_time(self.start_time),
-                    end_time=self.format_time(self.end_time),
-                    progress_callback=self.update_output
+                # Run extraction with progress callbacks
+                stats = extract_frames(
+                    video_path,
+                    output_folder,
+                    interval,
+                    start_time=start_time,
+                    end_time=end_time,
+                    progress_callback=channel.post_message,
+                    workers=workers,
+                    incremental=incremental,
+                    progress_events=channel.post_event,
+                    metrics_callback=lambda stats: channel.post('stats', stats.stage_summary())
                 )
-                
-                messagebox.showinfo("Success", "Frame extraction completed!")
+                channel.post_message(f"\nStage statistics:\n{stats}")
+                channel.post('done')
                 
             except Exception as e:
-                self.update_output(f"\nError: {str(e)}")
-                messagebox.showerror("Error", f"Failed to extract frames: {str(e)}")
-        
+                channel.post_message(f"\nError: {str(e)}")
+                channel.post('error', str(e))
+        
+        self.output_text.delete(1.0, tk.END)
+        self.update_output("Starting frame extraction...")
+        self.progress_bar['value'] = 0
+        self.progress_label.config(text="")
+        self.stats_label.config(text="")
+        self.progress_channel = channel
         threading.Thread(target=run_extraction, daemon=True).start()
+        self.poll_progress()
 
     def update_controls_state(self):
         state = 'normal' if self.cap is not None else 'disabled'
@@ -300,10 +492,22 @@ class VideoPlayer:
                 widget.config(state='normal')
 
     def __del__(self):
+        if self.read_ahead is not None:
+            self.read_ahead.stop()
+        if self.playback is not None:
+            self.playback.release()
+        if self.indexer is not None:
+            self.indexer.stop()
         if self.cap is not None:
             self.cap.release()
 
-if __name__ == "__main__":
+def main(video_path=None):
+    """Run the application, optionally opening a video at startup"""
     root = tk.Tk()
     app = VideoPlayer(root)
+    if video_path:
+        app.open_video(video_path)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()